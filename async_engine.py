@@ -0,0 +1,257 @@
+import asyncio
+import copy
+import logging
+import threading
+from rate_limiter import AdaptiveRateLimiter, call_with_limits, is_account_error, is_transient
+from metrics import RunMetrics
+from progress import ProgressTracker
+from clients import default_registry
+from text_filters import DEFAULT_TEXT_FILTER
+from backends import (
+    DeepLBackend, DeepSeekBackend, split_segments, join_segments, DEEPSEEK_BASE_URL,
+    DEFAULT_CONCURRENCY, DEFAULT_DEEPL_CONCURRENCY, DEFAULT_PACK_TOKEN_BUDGET, DEFAULT_STALL_TIMEOUT
+)
+
+logger = logging.getLogger()
+
+# Requests a backend must have completed before its latency percentile is
+# trusted as a hedging threshold
+HEDGE_MIN_SAMPLES = 20
+# How often a running request re-checks whether it has become a straggler
+HEDGE_CHECK_INTERVAL = 0.25
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def _get_loop():
+    # One long-lived event loop on a daemon thread runs every engine's work, so
+    # callers on any thread (GUI worker, script main thread) share it.
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="translation-loop", daemon=True).start()
+        return _loop
+
+def submit(coro):
+    # Schedules coro on the shared loop and returns a concurrent.futures.Future
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+def run_sync(coro):
+    return submit(coro).result()
+
+class AsyncTranslationEngine:
+    """Runs translation backends on the shared loop behind one rate limiter each.
+
+    The built-in DeepL and DeepSeek backends are created from the keyword
+    arguments; extra backends (or replacements for the built-in ones) are
+    passed in `backends` and addressed by name in translate().
+    """
+
+    def __init__(self, deepseek_api_key=None, deepl_translator=None, concurrency=DEFAULT_CONCURRENCY,
+                 deepl_concurrency=DEFAULT_DEEPL_CONCURRENCY, base_url=DEEPSEEK_BASE_URL,
+                 requests_per_second=None, tokens_per_minute=None, deepl_requests_per_second=None, metrics=None,
+                 progress=None, clients=None, backends=None, text_filter=DEFAULT_TEXT_FILTER, stream=False,
+                 stall_timeout=DEFAULT_STALL_TIMEOUT, hedge_percentile=None):
+        # Clients come from a registry that outlives the engine, so pooled
+        # connections are reused by later columns, files and runs
+        self.clients = clients or default_registry()
+        self.metrics = metrics or RunMetrics()
+        self.progress = progress or ProgressTracker()
+        # Decides which cells are sent out at all; None sends every non-empty cell
+        self.text_filter = text_filter
+        self.backends = {}
+        self.limiters = {}
+
+        if deepl_translator is not None:
+            self.add_backend(DeepLBackend(deepl_translator, concurrency=deepl_concurrency,
+                                          requests_per_second=deepl_requests_per_second))
+        if deepseek_api_key:
+            self.add_backend(DeepSeekBackend(
+                self.clients.openai(deepseek_api_key, base_url, concurrency), concurrency=concurrency,
+                requests_per_second=requests_per_second, tokens_per_minute=tokens_per_minute,
+                stream=stream, stall_timeout=stall_timeout, hedge_percentile=hedge_percentile
+            ))
+        for backend in backends or []:
+            self.add_backend(backend)
+
+    def add_backend(self, backend):
+        self.backends[backend.name] = backend
+        limiter = AdaptiveRateLimiter(backend.label, backend.concurrency, backend.requests_per_second,
+                                      backend.tokens_per_minute)
+        self.limiters[backend.name] = limiter
+        logger.info(f"Rate limiter {limiter.describe()}")
+
+    def fork(self, metrics=None, progress=None):
+        # An engine for one job among several running at once: the same backends
+        # and limiters, so all jobs share one concurrency and rate budget, but its
+        # own metrics and progress counters
+        forked = copy.copy(self)
+        forked.metrics = metrics or RunMetrics()
+        forked.progress = progress or ProgressTracker()
+        return forked
+
+    def backend(self, name):
+        if name not in self.backends:
+            raise RuntimeError(f"Translation backend '{name}' is not configured.")
+        return self.backends[name]
+
+    async def _request(self, backend, texts):
+        loop = asyncio.get_running_loop()
+        sent_at = {}
+
+        def attempt():
+            task = None
+
+            async def call_api():
+                # Time spent queued in the limiter does not make a request a straggler
+                sent_at[task] = loop.time()
+                return await backend.translate_batch(texts, self.metrics)
+
+            task = asyncio.ensure_future(call_with_limits(
+                self.limiters[backend.name], call_api, tokens=backend.request_tokens(texts),
+                metrics=self.metrics, engine=backend.name
+            ))
+            return task
+
+        if not backend.hedge_percentile:
+            return await attempt()
+
+        # A straggler past the percentile gets a duplicate request, if the limiter
+        # has a free slot for it; the first success wins and the other is cancelled
+        primary = attempt()
+        tasks = [primary]
+        limiter = self.limiters[backend.name]
+        try:
+            while True:
+                # The threshold is re-read as samples accumulate, so requests sent
+                # in the first wave of a run can still be hedged
+                threshold = self._hedge_delay(backend)
+                elapsed = loop.time() - sent_at[primary] if primary in sent_at else 0.0
+                if threshold is not None and elapsed >= threshold and limiter.in_flight < limiter.limit:
+                    break
+                timeout = HEDGE_CHECK_INTERVAL if threshold is None else max(threshold - elapsed, HEDGE_CHECK_INTERVAL)
+                done, _ = await asyncio.wait({primary}, timeout=timeout)
+                if done:
+                    return primary.result()
+            hedge = attempt()
+            tasks.append(hedge)
+            self.metrics.record_hedge(backend.name, "sent")
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.metrics.record_hedge(backend.name, "won")
+                        return task.result()
+            # Both failed; report the original request's error
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _hedge_delay(self, backend):
+        if self.metrics.request_count(backend.name) < HEDGE_MIN_SAMPLES:
+            return None
+        return self.metrics.latency_percentile(backend.name, backend.hedge_percentile)
+
+    async def translate(self, engine_name, texts, on_result=None, visited=(), **options):
+        # Returns one result per text, with None where the translation failed.
+        # on_result(idx, translation) is called for each success as it completes.
+        # visited lists the backends already tried for these texts (fallback chain).
+        backend = self.backend(engine_name)
+        visited = (*visited, backend.name)
+        if backend.segment_tokens:
+            splits = [split_segments(text, backend.segment_tokens) for text in texts]
+            if any(separators for _, separators in splits):
+                return await self._translate_segmented(backend, texts, splits, on_result, visited, **options)
+        return await self._translate(backend, texts, on_result, visited=visited, **options)
+
+    async def _translate_segmented(self, backend, texts, splits, on_result, visited, **options):
+        # Long texts go out as several shorter requests in parallel, so one huge
+        # cell no longer sets the run's completion time. A text is only complete
+        # (and reported) once every one of its segments has been translated.
+        segments, owners = [], []
+        for idx, (parts, _) in enumerate(splits):
+            segments.extend(parts)
+            owners.extend((idx, position) for position in range(len(parts)))
+        long_texts = sum(1 for _, separators in splits if separators)
+        logger.info(f"Split {long_texts} long texts for {backend.label}: {len(texts)} texts "
+                    f"became {len(segments)} segments.")
+
+        translated = [None] * len(texts)
+        parts_done = [[None] * len(parts) for parts, _ in splits]
+        remaining = [len(parts) for parts, _ in splits]
+
+        def on_segment(j, result):
+            idx, position = owners[j]
+            parts_done[idx][position] = result
+            remaining[idx] -= 1
+            if remaining[idx] == 0:
+                translated[idx] = join_segments(parts_done[idx], splits[idx][1])
+                if on_result is not None:
+                    on_result(idx, translated[idx])
+
+        # Segments of one text never share a request, even when packing
+        await self._translate(backend, segments, on_segment, groups=[idx for idx, _ in owners], visited=visited,
+                              **options)
+        return translated
+
+    async def _translate(self, backend, texts, on_result=None, groups=None, visited=(), **options):
+        translated = [None] * len(texts)
+
+        def store(idx, result):
+            translated[idx] = result
+            if result is not None and on_result is not None:
+                on_result(idx, result)
+
+        async def translate_range(start, end):
+            batch = texts[start:end]
+            try:
+                results = await self._request(backend, batch)
+            except Exception as e:
+                # Only errors a smaller request can fix (a malformed packed reply, a
+                # request the API rejected as too large or invalid) are retried in
+                # smaller pieces. Transient errors have already used up their retries.
+                if len(batch) == 1 or is_account_error(e) or is_transient(e):
+                    logger.error(f"{backend.label} translation failed for {len(batch)} text(s): {e}")
+                    return
+                parts = backend.split_failed(start, end)
+                logger.warning(f"{backend.label} batch of {len(batch)} texts failed, retrying as {len(parts)} "
+                               f"smaller requests: {e}")
+                await asyncio.gather(*(translate_range(part_start, part_end) for part_start, part_end in parts))
+                return
+            for offset, result in enumerate(results):
+                store(start + offset, result)
+
+        batches = backend.plan_batches(texts, groups=groups, **options)
+        if len(batches) < len(texts):
+            logger.info(f"Sending {len(texts)} texts to {backend.label} in {len(batches)} requests.")
+        await asyncio.gather(*(translate_range(start, end) for start, end in batches))
+
+        # Whatever a local backend could not translate goes to its fallback. A
+        # fallback that loops back or is not configured only loses the misses.
+        missing = [idx for idx, result in enumerate(translated) if result is None]
+        if backend.fallback is None or not missing:
+            return translated
+        if backend.fallback in visited:
+            logger.error(f"{backend.label}: fallback '{backend.fallback}' loops back to "
+                         f"{' -> '.join(visited)}; {len(missing)} texts left untranslated.")
+        elif backend.fallback not in self.backends:
+            logger.error(f"{backend.label}: fallback '{backend.fallback}' is not configured; "
+                         f"{len(missing)} texts left untranslated.")
+        else:
+            logger.info(f"{backend.label}: {len(missing)} texts not found, sending them to '{backend.fallback}'.")
+            await self.translate(
+                backend.fallback, [texts[idx] for idx in missing],
+                on_result=lambda j, result: store(missing[j], result), visited=visited, **options
+            )
+        return translated
+
+    def close(self):
+        # The clients belong to the registry and stay open for the next engine
+        for backend in self.backends.values():
+            backend.close()
+        self.backends = {}
@@ -0,0 +1,497 @@
+import asyncio
+import csv
+import functools
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from prompts import (
+    TARGET_LANG, DEEPSEEK_MODEL, DEEPSEEK_SYSTEM_PROMPT, DEEPSEEK_USER_TEMPLATE,
+    DEEPSEEK_PACKED_SYSTEM_PROMPT, DEEPSEEK_PACKED_USER_TEMPLATE, DEEPL_PROMPT_VERSION,
+    estimate_tokens, build_packed_payload, parse_packed_response, prompt_version
+)
+
+DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+
+# In-flight request limits. DeepSeek calls are plain coroutines, so the limit can
+# go into the thousands; the DeepL SDK is synchronous and each call holds a thread.
+DEFAULT_CONCURRENCY = 200
+DEFAULT_DEEPL_CONCURRENCY = 8
+
+# Packed DeepSeek requests: estimated input tokens per request and a hard cap on
+# segments, keeping the JSON reply well inside the model's output limit.
+DEFAULT_PACK_TOKEN_BUDGET = 2000
+DEFAULT_PACK_MAX_SEGMENTS = 50
+
+# Longer texts sent to a chat model are split into segments of about this many
+# estimated tokens, translated in parallel and joined back in order
+DEFAULT_SEGMENT_TOKENS = 500
+
+# Streamed requests are aborted (and retried) when no token arrives for this
+# long; non-streamed requests only have the client's overall timeout
+DEFAULT_STALL_TIMEOUT = 30.0
+
+# Optional routing config picked up by the GUI and the scripts when present
+DEFAULT_ROUTING_PATH = "translation_backends.json"
+
+# DeepL accepts at most 50 texts and 128 KiB of request body per request; a
+# little of the byte budget is kept for the other request fields
+DEEPL_MAX_BATCH_SIZE = 50
+DEEPL_MAX_REQUEST_BYTES = 128 * 1024 - 1024
+
+logger = logging.getLogger()
+
+def pack_batches(texts, token_budget=DEFAULT_PACK_TOKEN_BUDGET, max_segments=DEFAULT_PACK_MAX_SEGMENTS, groups=None):
+    # Greedily groups consecutive texts into batches of (start, end) index ranges
+    # whose estimated token total stays within budget. A text larger than the
+    # budget on its own ends up alone in its batch. Consecutive texts with the
+    # same entry in groups (segments of one long text) never share a batch.
+    batches = []
+    start, used = 0, 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        same_group = groups is not None and i > start and groups[i] == groups[i - 1]
+        if i > start and (used + tokens > token_budget or i - start >= max_segments or same_group):
+            batches.append((start, i))
+            start, used = i, 0
+        used += tokens
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+# Split after line breaks, Chinese sentence/clause ends, ! ? and ". "
+_SEGMENT_BOUNDARY_RE = re.compile(r"(?<=[\n。！？；!?])|(?<=\. )")
+
+def split_segments(text, max_tokens=DEFAULT_SEGMENT_TOKENS):
+    # Returns (segments, separators): the stripped segments to translate and the
+    # whitespace to put between their translations. Line breaks are kept; text
+    # that fits in max_tokens comes back as a single segment.
+    if estimate_tokens(text) <= max_tokens:
+        return [text], []
+
+    units = []
+    for unit in _SEGMENT_BOUNDARY_RE.split(text):
+        if estimate_tokens(unit) <= max_tokens:
+            units.append(unit)
+        else:
+            # A single sentence over the limit is cut at a fixed length; one
+            # character never costs more than one token
+            units.extend(unit[i:i + max_tokens] for i in range(0, len(unit), max_tokens))
+
+    chunks, current, used = [], "", 0
+    for unit in units:
+        tokens = estimate_tokens(unit)
+        if current.strip() and unit.strip() and used + tokens > max_tokens:
+            chunks.append(current)
+            current, used = "", 0
+        current += unit
+        used += tokens
+    chunks.append(current)
+
+    segments, separators = [], []
+    for chunk in chunks:
+        if not chunk.strip():
+            continue
+        if segments:
+            trailing = previous[len(previous.rstrip()):]
+            separators.append(trailing if "\n" in trailing else " ")
+        segments.append(chunk.strip())
+        previous = chunk
+    return segments, separators
+
+def join_segments(translations, separators):
+    parts = [translations[0]]
+    for separator, translation in zip(separators, translations[1:]):
+        parts.append(separator + translation)
+    return "".join(parts)
+
+def size_batches(texts, max_items=DEEPL_MAX_BATCH_SIZE, max_bytes=DEEPL_MAX_REQUEST_BYTES):
+    # Like pack_batches, but bounded by text count and by each text's size in
+    # the JSON request body (non-ASCII characters are sent as \uXXXX escapes)
+    batches = []
+    start, used = 0, 0
+    for i, text in enumerate(texts):
+        size = len(json.dumps(text)) + 1
+        if i > start and (used + size > max_bytes or i - start >= max_items):
+            batches.append((start, i))
+            start, used = i, 0
+        used += size
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+class TranslationBackend:
+    """A translation service the engine can send batches of texts to.
+
+    Subclasses implement translate_batch (one request, raising on failure)
+    and describe themselves through class attributes: max_batch_size texts
+    per request, a concurrency hint for the shared limiter and connection
+    pool, optional rate limits, and cost_per_token for estimates. The engine
+    handles batching, rate limiting, retries and per-item fallback.
+    """
+
+    name = None
+    label = None
+    max_batch_size = 1
+    concurrency = 8
+    requests_per_second = None
+    tokens_per_minute = None
+    cost_per_token = 0.0
+    # Backends that never leave the machine are not worth caching
+    cacheable = True
+    # Another backend's name to send texts this one could not translate to
+    fallback = None
+    # Texts over this many estimated tokens are split into segments (None = never)
+    segment_tokens = None
+    # Send a duplicate of any request still running past this latency percentile
+    # of the backend's earlier requests and keep whichever answers first (None = never)
+    hedge_percentile = None
+
+    def cache_scope(self):
+        # (engine, model, prompt_version, target_lang) for TranslationCache
+        raise NotImplementedError
+
+    def plan_misses(self, texts):
+        # For estimates: the texts this backend would pass on to its fallback.
+        # Without a way to tell in advance, assume all of them.
+        return list(texts)
+
+    def plan_batches(self, texts, **options):
+        # (start, end) ranges of texts to send as one request each
+        step = self.max_batch_size
+        return [(start, min(start + step, len(texts))) for start in range(0, len(texts), step)]
+
+    def split_failed(self, start, end):
+        # Ranges to retry when the request for texts[start:end] failed; by
+        # default every text is retried on its own
+        return [(i, i + 1) for i in range(start, end)]
+
+    def request_tokens(self, texts):
+        # Estimate for the tokens/min bucket
+        return sum(estimate_tokens(text) for text in texts)
+
+    def estimate_cost(self, texts):
+        return self.request_tokens(texts) * self.cost_per_token
+
+    async def translate_batch(self, texts, metrics=None):
+        # One request; returns one translation per text (None where it has none)
+        raise NotImplementedError
+
+    def describe(self):
+        return f"{self.label} (batch {self.max_batch_size}, concurrency {self.concurrency})"
+
+    def close(self):
+        # Releases what the backend owns itself; API clients belong to the registry
+        pass
+
+class DeepLBackend(TranslationBackend):
+    name = "deepl"
+    label = "DeepL"
+    max_batch_size = DEEPL_MAX_BATCH_SIZE
+    concurrency = DEFAULT_DEEPL_CONCURRENCY
+    # DeepL bills characters; cost_per_character is used for estimates instead
+    cost_per_character = 25 / 1_000_000
+
+    def __init__(self, translator, concurrency=None, requests_per_second=None, name=None, label=None):
+        self.translator = translator
+        self.concurrency = concurrency or self.concurrency
+        self.requests_per_second = requests_per_second
+        self.name = name or self.name
+        self.label = label or self.label
+        self._executor = None
+
+    def cache_scope(self):
+        return ("deepl", "deepl", DEEPL_PROMPT_VERSION, TARGET_LANG)
+
+    def plan_batches(self, texts, **options):
+        return size_batches(texts, self.max_batch_size)
+
+    def split_failed(self, start, end):
+        # Halves, so one bad text in a batch of 50 costs a handful of extra
+        # requests rather than 50 and the rest of the batch still succeeds
+        middle = (start + end) // 2
+        return [(start, middle), (middle, end)]
+
+    def estimate_cost(self, texts):
+        return sum(len(text) for text in texts) * self.cost_per_character
+
+    async def translate_batch(self, texts, metrics=None):
+        # The SDK blocks, so each request in flight takes a thread. They come from
+        # a pool of their own sized to the concurrency: the loop's default pool is
+        # only min(32, CPUs + 4) threads and also serves the cache lookups.
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"{self.name}-request")
+        translations = await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(self.translator.translate_text, texts, target_lang=TARGET_LANG)
+        )
+        return [t.text for t in translations]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+class OpenAICompatibleBackend(TranslationBackend):
+    """Any /chat/completions endpoint: DeepSeek, OpenAI, or a local server (vLLM, llama.cpp, Ollama)."""
+
+    name = "openai"
+    label = "OpenAI-compatible"
+    max_batch_size = DEFAULT_PACK_MAX_SEGMENTS
+    concurrency = DEFAULT_CONCURRENCY
+    segment_tokens = DEFAULT_SEGMENT_TOKENS
+
+    def __init__(self, client, model, name=None, label=None, concurrency=None, requests_per_second=None,
+                 tokens_per_minute=None, cost_per_token=None, max_batch_size=None, cacheable=True,
+                 segment_tokens=None, stream=False, stall_timeout=DEFAULT_STALL_TIMEOUT, hedge_percentile=None):
+        self.client = client
+        self.model = model
+        self.name = name or self.name
+        self.label = label or self.label
+        self.concurrency = concurrency or self.concurrency
+        self.requests_per_second = requests_per_second
+        self.tokens_per_minute = tokens_per_minute
+        self.cost_per_token = cost_per_token if cost_per_token is not None else self.cost_per_token
+        self.max_batch_size = max_batch_size or self.max_batch_size
+        self.cacheable = cacheable
+        if segment_tokens is not None:
+            # 0 turns splitting off
+            self.segment_tokens = segment_tokens or None
+        self.stream = stream
+        self.stall_timeout = stall_timeout
+        self.hedge_percentile = hedge_percentile
+        self.prompt_version = prompt_version(
+            model, DEEPSEEK_SYSTEM_PROMPT, DEEPSEEK_USER_TEMPLATE,
+            DEEPSEEK_PACKED_SYSTEM_PROMPT, DEEPSEEK_PACKED_USER_TEMPLATE
+        )
+
+    def cache_scope(self):
+        return (self.name, self.model, self.prompt_version, TARGET_LANG)
+
+    def plan_batches(self, texts, packed=False, pack_token_budget=DEFAULT_PACK_TOKEN_BUDGET, groups=None, **options):
+        # One text per request unless packing is enabled; segments of one text
+        # (same groups entry) always go out as separate requests
+        if not packed:
+            return [(i, i + 1) for i in range(len(texts))]
+        return pack_batches(texts, pack_token_budget, self.max_batch_size, groups)
+
+    def request_tokens(self, texts):
+        # Prompt tokens plus a similar amount of output
+        system_prompt = DEEPSEEK_SYSTEM_PROMPT if len(texts) == 1 else DEEPSEEK_PACKED_SYSTEM_PROMPT
+        return 2 * (estimate_tokens(system_prompt) + super().request_tokens(texts))
+
+    async def _chat(self, system_prompt, user_content, metrics=None, **kwargs):
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ]
+        if self.stream:
+            return await self._chat_stream(messages, metrics, **kwargs)
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stream=False,
+            **kwargs
+        )
+        if metrics is not None:
+            metrics.record_tokens(self.name, getattr(response, "usage", None))
+        return response.choices[0].message.content
+
+    async def _chat_stream(self, messages, metrics=None, **kwargs):
+        # Reads the reply chunk by chunk. asyncio.TimeoutError when nothing arrives
+        # within stall_timeout tells a dead connection from slow generation, and is
+        # retried like any other timeout.
+        started = time.perf_counter()
+        stream = await asyncio.wait_for(self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            **kwargs
+        ), self.stall_timeout)
+
+        parts, usage, first_token, chunks = [], None, None, 0
+        try:
+            chunk_iterator = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunk_iterator.__anext__(), self.stall_timeout)
+                except StopAsyncIteration:
+                    break
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    parts.append(chunk.choices[0].delta.content)
+                    chunks += 1
+        finally:
+            await stream.close()
+
+        if metrics is not None:
+            metrics.record_tokens(self.name, usage)
+            if first_token is not None:
+                # Servers that skip the usage chunk send roughly one token per chunk
+                tokens = getattr(usage, "completion_tokens", None) or chunks
+                metrics.record_stream(self.name, first_token - started, tokens, time.perf_counter() - first_token)
+        return "".join(parts)
+
+    async def translate_batch(self, texts, metrics=None):
+        if len(texts) == 1:
+            content = await self._chat(DEEPSEEK_SYSTEM_PROMPT, DEEPSEEK_USER_TEMPLATE.format(text=texts[0]), metrics)
+            return [content.strip()]
+        content = await self._chat(
+            DEEPSEEK_PACKED_SYSTEM_PROMPT,
+            DEEPSEEK_PACKED_USER_TEMPLATE.format(payload=build_packed_payload(texts)),
+            metrics,
+            response_format={"type": "json_object"}
+        )
+        # Raises ValueError on a malformed reply, which sends the batch out item by item
+        return parse_packed_response(content, len(texts))
+
+class DeepSeekBackend(OpenAICompatibleBackend):
+    name = "deepseek"
+    label = "DeepSeek"
+    # deepseek-chat list price per token, input and output averaged (USD)
+    cost_per_token = 0.7 / 1_000_000
+
+    def __init__(self, client, model=DEEPSEEK_MODEL, **kwargs):
+        super().__init__(client, model, **kwargs)
+
+class GlossaryBackend(TranslationBackend):
+    """Offline exact-match dictionary, e.g. for short categorical columns like Pets_Kids.
+
+    Texts missing from the glossary come back as None, or are sent to the
+    fallback backend when one is configured.
+    """
+
+    name = "glossary"
+    label = "Glossary"
+    max_batch_size = 10000
+    concurrency = 4
+    cacheable = False
+
+    def __init__(self, entries, name=None, label=None, fallback=None, normalize=True):
+        from translator import normalize_text
+
+        self.name = name or self.name
+        self.label = label or self.label
+        self.fallback = fallback
+        self._key = normalize_text if normalize else (lambda text: text)
+        self.entries = {self._key(source): target for source, target in entries.items()}
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        # JSON object {"source": "translation"} or a two-column CSV (source, translation)
+        if path.lower().endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                entries = json.load(f)
+        else:
+            with open(path, encoding="utf-8-sig", newline="") as f:
+                entries = {row[0]: row[1] for row in csv.reader(f) if len(row) >= 2 and row[0]}
+        logger.info(f"Loaded {len(entries)} glossary entries from {path}.")
+        return cls(entries, **kwargs)
+
+    def cache_scope(self):
+        return None
+
+    def plan_misses(self, texts):
+        return [text for text in texts if self._key(text) not in self.entries]
+
+    async def translate_batch(self, texts, metrics=None):
+        return [self.entries.get(self._key(text)) for text in texts]
+
+# Configured backend types and the class each one builds
+BACKEND_TYPES = {
+    "deepl": DeepLBackend,
+    "deepseek": DeepSeekBackend,
+    "openai": OpenAICompatibleBackend,
+    "glossary": GlossaryBackend,
+}
+
+def build_backend(name, spec, clients):
+    # spec is one entry of the "backends" section of the routing config
+    kind = spec.get("type", name)
+    if kind not in BACKEND_TYPES:
+        raise ValueError(f"Unknown backend type '{kind}' for backend '{name}'.")
+    label = spec.get("label", name)
+
+    if kind == "glossary":
+        return GlossaryBackend.from_file(spec["path"], name=name, label=label, fallback=spec.get("fallback"),
+                                         normalize=spec.get("normalize", True))
+
+    api_key = spec.get("api_key") or os.getenv(spec.get("api_key_env", ""), "")
+    concurrency = spec.get("concurrency")
+    if kind == "deepl":
+        concurrency = concurrency or DEFAULT_DEEPL_CONCURRENCY
+        return DeepLBackend(clients.deepl(api_key, concurrency), concurrency=concurrency,
+                            requests_per_second=spec.get("requests_per_second"), name=name, label=label)
+
+    # Local servers usually ignore the key but the SDK insists on one
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    client = clients.openai(api_key or "local", spec.get("base_url", DEEPSEEK_BASE_URL), concurrency)
+    options = {
+        "name": name, "label": label, "concurrency": concurrency,
+        "requests_per_second": spec.get("requests_per_second"),
+        "tokens_per_minute": spec.get("tokens_per_minute"),
+        "cost_per_token": spec.get("cost_per_token"),
+        "max_batch_size": spec.get("max_batch_size"),
+        "cacheable": spec.get("cacheable", True),
+        "segment_tokens": spec.get("segment_tokens"),
+        "stream": spec.get("stream", False),
+        "stall_timeout": spec.get("stall_timeout", DEFAULT_STALL_TIMEOUT),
+        "hedge_percentile": spec.get("hedge_percentile"),
+    }
+    if kind == "deepseek":
+        return DeepSeekBackend(client, spec.get("model", DEEPSEEK_MODEL), **options)
+    return OpenAICompatibleBackend(client, spec["model"], **options)
+
+# Backends every engine has without a routing config
+BUILTIN_BACKENDS = ("deepl", "deepseek")
+
+def check_routing(path):
+    # Reads a routing config and checks that every glossary fallback and every
+    # column names a configured backend, so a typo fails at startup instead of
+    # leaving a column untranslated mid-run. Returns the parsed config.
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    specs = config.get("backends", {})
+    names = set(BUILTIN_BACKENDS) | set(specs)
+    for name, spec in specs.items():
+        fallback = spec.get("fallback")
+        if fallback is not None and fallback not in names:
+            raise ValueError(f"Backend '{name}' falls back to unknown backend '{fallback}' "
+                             f"(configured: {', '.join(sorted(names))}).")
+        # A chain that comes back to a backend would recurse forever
+        chain = [name]
+        while fallback is not None and fallback in specs:
+            if fallback in chain:
+                raise ValueError(f"Fallback chain of backend '{name}' loops: {' -> '.join(chain + [fallback])}.")
+            chain.append(fallback)
+            fallback = specs[fallback].get("fallback")
+    for column, name in config.get("columns", {}).items():
+        if name not in names:
+            raise ValueError(f"Column '{column}' is routed to unknown backend '{name}' "
+                             f"(configured: {', '.join(sorted(names))}).")
+    return config
+
+def load_routing(path, clients):
+    """Read a routing config: extra backends and which backend translates each column.
+
+        {
+          "backends": {
+            "local": {"type": "glossary", "path": "glossary.csv", "fallback": "deepl"},
+            "qwen": {"type": "openai", "base_url": "http://localhost:8000/v1", "model": "qwen2.5-7b-instruct",
+                     "concurrency": 4, "cacheable": false}
+          },
+          "columns": {"Pets_Kids": "local", "Shooting_Requirements": "deepseek"}
+        }
+
+    Returns (backends, columns). Columns not listed keep their default
+    engine; "deepl" and "deepseek" refer to the built-in backends unless
+    redefined here.
+    """
+    config = check_routing(path)
+    backends = [build_backend(name, spec, clients) for name, spec in config.get("backends", {}).items()]
+    return backends, dict(config.get("columns", {}))
@@ -0,0 +1,243 @@
+"""Translate many workbooks in one go.
+
+    python batch_cli.py vendor_files/ "archive/2025-*.xlsx" --workers 4 --concurrency 200
+
+Inputs are directories (every .xlsx, .parquet and .arrow inside) or glob
+patterns; each result is written next to its input as <name>_translated.xlsx
+(or .parquet/.arrow for columnar inputs, or --output-format). Files are spread over a
+pool of worker processes. Each worker builds its engine, API clients and
+cache once and reuses them for every file it gets. The API concurrency and
+rate limits are a global budget split evenly between the workers. API keys
+are read from DEEPL_AUTH_KEY and DEEPSEEK_API_KEY.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from async_engine import DEFAULT_CONCURRENCY, DEFAULT_DEEPL_CONCURRENCY, DEFAULT_STALL_TIMEOUT
+from backends import check_routing, DEFAULT_ROUTING_PATH
+from columnar import is_columnar
+
+OUTPUT_STEM_SUFFIX = "_translated"
+INPUT_EXTENSIONS = (".xlsx", ".parquet", ".arrow")
+
+_worker = {}
+
+def collect_inputs(patterns):
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [m for ext in INPUT_EXTENSIONS for m in glob.glob(os.path.join(pattern, "*" + ext))]
+        else:
+            matches = glob.glob(pattern)
+        files.extend(m for m in sorted(matches) if not os.path.splitext(m)[0].endswith(OUTPUT_STEM_SUFFIX)
+                     and not os.path.basename(m).startswith("~$"))  # Excel lock files
+    # Keep the first occurrence when patterns overlap
+    return list(dict.fromkeys(os.path.abspath(f) for f in files))
+
+def output_path(input_file, output_format=None):
+    base, ext = os.path.splitext(input_file)
+    if output_format:
+        ext = "." + output_format
+    elif not is_columnar(input_file):
+        ext = ".xlsx"
+    return base + OUTPUT_STEM_SUFFIX + ext
+
+def split_budget(total, workers, minimum=1):
+    return max(minimum, total // workers) if total else total
+
+def _init_worker(options):
+    from async_engine import AsyncTranslationEngine
+    from backends import load_routing
+    from clients import default_registry
+    from pipeline import column_routing
+    from text_filters import TextFilter, DEFAULT_TEXT_FILTER
+    from translation_cache import TranslationCache
+
+    logging.basicConfig(level=options["log_level"],
+                        format="%(asctime)s - %(processName)s - %(levelname)s - %(message)s")
+    backends, columns, text_filter = [], {}, DEFAULT_TEXT_FILTER
+    if options["backends_config"]:
+        backends, columns = load_routing(options["backends_config"], default_registry())
+        text_filter = TextFilter.from_config(options["backends_config"])
+    _worker["options"] = options
+    _worker["columns"] = column_routing(columns)
+    _worker["cache"] = TranslationCache(options["cache_path"])
+    _worker["engine"] = AsyncTranslationEngine(
+        deepseek_api_key=options["deepseek_api_key"],
+        deepl_translator=default_registry().deepl(options["deepl_auth_key"], options["deepl_concurrency"]),
+        concurrency=options["concurrency"], deepl_concurrency=options["deepl_concurrency"],
+        requests_per_second=options["rps"], tokens_per_minute=options["tpm"], backends=backends,
+        text_filter=text_filter, stream=options["stream"], stall_timeout=options["stall_timeout"],
+        hedge_percentile=options["hedge_percentile"]
+    )
+
+def _translate_file(input_file):
+    from metrics import RunMetrics
+    from pipeline import process_workbook
+    from progress import ProgressTracker
+
+    options = _worker["options"]
+    engine = _worker["engine"]
+    # Fresh counters per file so each summary line only covers that file
+    engine.metrics = RunMetrics()
+    engine.progress = ProgressTracker()
+    output_file = output_path(input_file, options["output_format"])
+    started = time.perf_counter()
+    summary = {"input": input_file, "output": output_file}
+    try:
+        summary["rows"] = process_workbook(
+            input_file, output_file, engine, cache=_worker["cache"], resume=options["resume"],
+            chunk_rows=options["chunk_rows"], packed=options["packed"], column_engines=_worker["columns"],
+            incremental=options["incremental"], stage=options["stage"]
+        )
+        summary["status"] = "ok"
+    except Exception as e:
+        logging.getLogger().error(f"Translation failed for {input_file}: {e}")
+        summary["status"] = "failed"
+        summary["error"] = str(e)
+
+    metrics = engine.metrics.to_dict()
+    summary.update({
+        "seconds": time.perf_counter() - started,
+        "requests": sum(r["count"] for r in metrics["requests"].values()),
+        "retries": sum(metrics["retries"].values()),
+        "cache_hits": metrics["cache"]["hits"],
+        "cache_misses": metrics["cache"]["misses"],
+    })
+    return summary
+
+def _format_summary(summary):
+    name = os.path.basename(summary["input"])
+    if summary["status"] != "ok":
+        return f"FAILED {name} after {summary['seconds']:.1f}s: {summary['error']}"
+    return (f"ok     {name}: {summary['rows']} rows in {summary['seconds']:.1f}s, "
+            f"{summary['requests']} requests, {summary['retries']} retries, "
+            f"{summary['cache_hits']} cache hits")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Translate a directory or glob of workbooks in parallel.")
+    parser.add_argument("inputs", nargs="+", help="directories and/or glob patterns of .xlsx files")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="worker processes (default: min(4, CPUs))")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="DeepSeek requests in flight across all workers")
+    parser.add_argument("--deepl-concurrency", type=int, default=DEFAULT_DEEPL_CONCURRENCY,
+                        help="DeepL requests in flight across all workers")
+    parser.add_argument("--rps", type=float, default=None, help="DeepSeek requests/sec across all workers")
+    parser.add_argument("--tpm", type=int, default=None, help="DeepSeek tokens/min across all workers")
+    parser.add_argument("--packed", action="store_true", help="pack several texts into each DeepSeek request")
+    parser.add_argument("--stream", action="store_true", help="stream DeepSeek replies and abort stalled requests")
+    parser.add_argument("--stall-timeout", type=float, default=DEFAULT_STALL_TIMEOUT,
+                        help="seconds without a streamed token before a request is retried")
+    parser.add_argument("--hedge-percentile", type=float, default=None,
+                        help="duplicate DeepSeek requests running past this latency percentile (e.g. 95)")
+    parser.add_argument("--resume", action="store_true", help="reuse journals left by interrupted runs")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only translate rows added or changed since the last --incremental run")
+    parser.add_argument("--skip-existing", action="store_true", help="skip inputs whose output already exists")
+    parser.add_argument("--stream-chunk-rows", type=int, default=0,
+                        help="stream each workbook in chunks of this many rows (0 = load whole workbook)")
+    parser.add_argument("--output-format", choices=["xlsx", "parquet", "arrow"], default=None,
+                        help="format of the translated files (default: xlsx, or the input's columnar format)")
+    parser.add_argument("--stage", action="store_true",
+                        help="keep Parquet copies of the preprocessed and translated frames for fast re-runs")
+    parser.add_argument("--cache", default="translation_cache.sqlite3", help="translation cache shared by all workers")
+    parser.add_argument("--backends", default=None,
+                        help=f"backend/column routing config (default: {DEFAULT_ROUTING_PATH} if it exists)")
+    parser.add_argument("--summary", default=None, help="also write the per-file summary as JSON")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    from prompts import DEEPSEEK_PROMPT_VERSION
+    from translation_cache import TranslationCache
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    logger = logging.getLogger()
+    args = parse_args(argv)
+
+    deepl_auth_key = os.getenv("DEEPL_AUTH_KEY")
+    deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
+    if not deepl_auth_key or not deepseek_api_key:
+        logger.error("DEEPL_AUTH_KEY and DEEPSEEK_API_KEY environment variables must be set.")
+        sys.exit(1)
+
+    files = collect_inputs(args.inputs)
+    if args.skip_existing:
+        files = [f for f in files if not os.path.exists(output_path(f, args.output_format))]
+    if not files:
+        logger.error("No input workbooks found.")
+        sys.exit(1)
+
+    # Stale DeepSeek entries are dropped once here rather than by every worker
+    cache = TranslationCache(args.cache)
+    cache.invalidate("deepseek", keep_prompt_version=DEEPSEEK_PROMPT_VERSION)
+    cache.close()
+
+    backends_config = args.backends or (DEFAULT_ROUTING_PATH if os.path.exists(DEFAULT_ROUTING_PATH) else None)
+    if backends_config:
+        # Checked here so a bad config fails once instead of in every worker
+        try:
+            check_routing(backends_config)
+        except Exception as e:
+            logger.error(f"Failed to load backend config {backends_config}: {e}")
+            sys.exit(1)
+
+    workers = max(1, min(args.workers, len(files)))
+    options = {
+        "deepl_auth_key": deepl_auth_key,
+        "deepseek_api_key": deepseek_api_key,
+        "concurrency": split_budget(args.concurrency, workers),
+        "deepl_concurrency": split_budget(args.deepl_concurrency, workers),
+        "rps": args.rps / workers if args.rps else None,
+        "tpm": args.tpm // workers if args.tpm else None,
+        "packed": args.packed,
+        "stream": args.stream,
+        "stall_timeout": args.stall_timeout,
+        "hedge_percentile": args.hedge_percentile,
+        "resume": args.resume,
+        "incremental": args.incremental,
+        "output_format": args.output_format,
+        "stage": args.stage,
+        "chunk_rows": args.stream_chunk_rows,
+        "cache_path": args.cache,
+        "backends_config": backends_config and os.path.abspath(backends_config),
+        "log_level": logging.INFO if args.verbose else logging.WARNING,
+    }
+    logger.info(f"Translating {len(files)} workbooks with {workers} workers, "
+                f"{options['concurrency']} DeepSeek / {options['deepl_concurrency']} DeepL requests in flight each.")
+
+    started = time.perf_counter()
+    summaries = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(options,)) as executor:
+        futures = {executor.submit(_translate_file, f): f for f in files}
+        for future in as_completed(futures):
+            try:
+                summary = future.result()
+            except Exception as e:
+                # The worker itself died (or failed to start); the file was not processed
+                summary = {"input": futures[future], "output": output_path(futures[future], args.output_format),
+                           "status": "failed", "error": str(e), "seconds": 0.0}
+            summaries.append(summary)
+            print(_format_summary(summary), flush=True)
+
+    failed = [s for s in summaries if s["status"] != "ok"]
+    rows = sum(s.get("rows", 0) for s in summaries)
+    print(f"\n{len(summaries) - len(failed)}/{len(summaries)} workbooks translated, {rows} rows "
+          f"in {time.perf_counter() - started:.1f}s.")
+    for s in failed:
+        print(f"  failed: {s['input']}: {s['error']}")
+
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(sorted(summaries, key=lambda s: s["input"]), f, indent=2)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Offline throughput benchmarks for the translation pipeline and Sheets writer.
+
+DeepSeek is replaced by a local OpenAI-compatible HTTP stub, DeepL and
+gspread by in-process fakes, so runs cost nothing and are repeatable.
+Each configuration runs in a fresh process so peak memory is per run.
+
+    python -m benchmarks.run_benchmarks --rows 1000 10000 --concurrency 50 200 --pack-token-budget 0 2000
+"""
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_config(config):
+    import pandas as pd
+    from async_engine import AsyncTranslationEngine, DEFAULT_PACK_TOKEN_BUDGET
+    from pipeline import preprocess_dataframe, postprocess_dataframe, translate_dataframe
+    from sheets_writer import write_to_google_sheets
+    from translator import EXPECTED_COLUMNS
+    from benchmarks.stubs import OpenAIStubServer, FakeDeepLTranslator, FakeGspreadClient
+    from benchmarks.synthetic import worksheet_titles
+
+    logging.basicConfig(level=config["log_level"], format="%(asctime)s - %(levelname)s - %(message)s")
+    logger = logging.getLogger()
+
+    stub = OpenAIStubServer(
+        median_latency=config["latency"], latency_sigma=config["latency_sigma"],
+        per_token_delay=config["per_token_delay"], rate_429=config["rate_429"],
+        failure_rate=config["failure_rate"], seed=config["seed"], stall_rate=config["stall_rate"]
+    ).start()
+    deepl_translator = FakeDeepLTranslator(latency=config["deepl_latency"])
+    gc = FakeGspreadClient(worksheet_titles(config["addresses"]), latency=config["sheets_latency"])
+    engine = AsyncTranslationEngine(
+        deepseek_api_key="benchmark", deepl_translator=deepl_translator,
+        concurrency=config["concurrency"], base_url=stub.base_url, stream=config["stream"],
+        stall_timeout=config["stall_timeout"], hedge_percentile=config["hedge_percentile"]
+    )
+    output_file = os.path.join(config["workdir"], f"bench_{os.getpid()}_translated.xlsx")
+
+    try:
+        metrics = engine.metrics
+        started = time.perf_counter()
+        with metrics.stage("read_excel"):
+            df = pd.read_excel(config["input_file"])
+        df.columns = EXPECTED_COLUMNS
+        with metrics.stage("preprocess"):
+            df = preprocess_dataframe(df)
+        df = translate_dataframe(
+            df, engine, packed=config["pack_token_budget"] > 0,
+            pack_token_budget=config["pack_token_budget"] or DEFAULT_PACK_TOKEN_BUDGET
+        )
+        with metrics.stage("postprocess"):
+            df = postprocess_dataframe(df)
+        with metrics.stage("write_excel"):
+            df.to_excel(output_file, index=False)
+        with metrics.stage("sheets_write"):
+            unmatched = write_to_google_sheets(df, "benchmark", None, logger, gc=gc, write_interval=0)
+        wall = time.perf_counter() - started
+    finally:
+        engine.close()
+        stub.stop()
+        if os.path.exists(output_file):
+            os.remove(output_file)
+
+    deepseek = stub.log.summary()
+    deepl_summary = deepl_translator.log.summary()
+    metrics_data = engine.metrics.to_dict()
+    return {
+        "rows": config["rows"],
+        "concurrency": config["concurrency"],
+        "pack_token_budget": config["pack_token_budget"],
+        "wall_s": wall,
+        "rows_per_s": config["rows"] / wall if wall else 0.0,
+        "deepseek_calls": deepseek["calls"],
+        "deepseek_p50_ms": deepseek["p50_ms"],
+        "deepseek_p99_ms": deepseek["p99_ms"],
+        "deepseek_statuses": deepseek["statuses"],
+        "deepl_calls": deepl_summary["calls"],
+        "deepl_p50_ms": deepl_summary["p50_ms"],
+        "deepl_p99_ms": deepl_summary["p99_ms"],
+        "sheets_calls": gc.log.calls,
+        "unmatched_rows": len(unmatched),
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages_s": {name: stage["seconds"] for name, stage in engine.metrics.stages.items()},
+        "retries": metrics_data["retries"],
+        "first_token": metrics_data["first_token"],
+        "hedges": metrics_data["hedges"],
+    }
+
+def _print_table(results):
+    header = (f"{'rows':>7} {'conc':>5} {'pack':>5} {'wall s':>8} {'rows/s':>9} {'DS calls':>9} "
+              f"{'DS p50':>8} {'DS p99':>8} {'DL calls':>8} {'GS calls':>8} {'peak MB':>8}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        peak = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "n/a"
+        print(f"{r['rows']:>7} {r['concurrency']:>5} {r['pack_token_budget']:>5} {r['wall_s']:>8.2f} "
+              f"{r['rows_per_s']:>9.1f} {r['deepseek_calls']:>9} {r['deepseek_p50_ms']:>7.0f}ms "
+              f"{r['deepseek_p99_ms']:>6.0f}ms {r['deepl_calls']:>8} {r['sheets_calls']:>8} {peak:>8}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks with local stand-ins for DeepSeek, DeepL and Google Sheets.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[200])
+    parser.add_argument("--pack-token-budget", type=int, nargs="+", default=[0],
+                        help="0 sends one DeepSeek request per text; >0 enables packed requests with that budget")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.4)
+    parser.add_argument("--addresses", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="median DeepSeek stub latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal spread of the stub latency")
+    parser.add_argument("--per-token-delay", type=float, default=0.0, help="extra stub seconds per output token")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of stub requests answered with 429")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of stub requests answered with 500")
+    parser.add_argument("--stream", action="store_true", help="stream DeepSeek replies (server-sent events)")
+    parser.add_argument("--stall-rate", type=float, default=0.0,
+                        help="fraction of streamed stub replies that stop after the first token")
+    parser.add_argument("--stall-timeout", type=float, default=30.0,
+                        help="seconds without a streamed token before a request is aborted and retried")
+    parser.add_argument("--hedge-percentile", type=float, default=None,
+                        help="send a duplicate of DeepSeek requests running past this latency percentile")
+    parser.add_argument("--deepl-latency", type=float, default=0.3)
+    parser.add_argument("--sheets-latency", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="directory for generated workbooks (reused between runs)")
+    parser.add_argument("--output", default=None, help="write results as JSON for run-to-run comparison")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    from benchmarks.synthetic import make_workbook
+
+    args = parse_args(argv)
+    workdir = args.workdir or os.path.join(tempfile.gettempdir(), "excel_translator_bench")
+    os.makedirs(workdir, exist_ok=True)
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for rows, concurrency, budget in itertools.product(args.rows, args.concurrency, args.pack_token_budget):
+        input_file = os.path.join(workdir, f"synthetic_{rows}_{args.duplicate_ratio}_{args.seed}.xlsx")
+        if not os.path.exists(input_file):
+            print(f"Generating {rows}-row workbook at {input_file}...", flush=True)
+            make_workbook(input_file, rows, args.addresses, args.duplicate_ratio, args.seed)
+
+        config = dict(vars(args), rows=rows, concurrency=concurrency, pack_token_budget=budget,
+                      input_file=input_file, workdir=workdir,
+                      log_level=logging.INFO if args.verbose else logging.WARNING)
+        print(f"Running rows={rows} concurrency={concurrency} pack_token_budget={budget}...", flush=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results.append(executor.submit(run_config, config).result())
+
+    print()
+    _print_table(results)
+    print()
+    for r in results:
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in r["stages_s"].items())
+        print(f"rows={r['rows']} concurrency={r['concurrency']} pack={r['pack_token_budget']}: {stages}")
+        for engine, first_token in r["first_token"].items():
+            hedges = {key.split(":")[1]: n for key, n in r["hedges"].items() if key.startswith(f"{engine}:")}
+            print(f"  {engine} first token p50 {first_token['p50_s']:.3f}s, p95 {first_token['p95_s']:.3f}s; "
+                  f"hedged {hedges.get('sent', 0)}, won {hedges.get('won', 0)}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import json
+import math
+import random
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from prompts import estimate_tokens
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(pct / 100 * len(ordered))) - 1)]
+
+class RequestLog:
+    # Thread-safe record of simulated request latencies and outcomes
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.statuses = {}
+
+    def record(self, latency, status=200):
+        with self._lock:
+            self.latencies.append(latency)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    @property
+    def calls(self):
+        return len(self.latencies)
+
+    def summary(self):
+        with self._lock:
+            return {
+                "calls": len(self.latencies),
+                "p50_ms": _percentile(self.latencies, 50) * 1000,
+                "p99_ms": _percentile(self.latencies, 99) * 1000,
+                "statuses": dict(self.statuses),
+            }
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        started = time.perf_counter()
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        status, payload, headers = self.server.stub.respond(self.path, body)
+        if status == 200 and body.get("stream"):
+            self._send_events(payload)
+            self.server.stub.log.record(time.perf_counter() - started, status)
+            return
+
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.stub.log.record(time.perf_counter() - started, status)
+
+    def _send_events(self, events):
+        # Server-sent events over chunked transfer encoding; None means the
+        # stream stalls for good (the client has to give up on its own)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for delay, event in events:
+            if event is None:
+                time.sleep(delay)
+                return
+            time.sleep(delay)
+            data = f"data: {event}\n\n".encode("utf-8")
+            try:
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return  # client aborted or hedged
+        self.wfile.write(b"0\r\n\r\n")
+
+class OpenAIStubServer:
+    """Local OpenAI-compatible /chat/completions endpoint with simulated latency.
+
+    Each request waits median_latency scaled by a log-normal factor
+    (latency_sigma) plus per_token_delay for every output token, and fails
+    with 429 or 500 at the configured rates. Replies are "EN:" + source text,
+    and packed JSON requests are answered segment by segment.
+
+    Requests with "stream": true are answered as server-sent events: the
+    latency above passes before the first token and per_token_delay between
+    tokens. A stall_rate fraction of streams stop after their first token.
+    """
+
+    def __init__(self, median_latency=0.2, latency_sigma=0.5, per_token_delay=0.0,
+                 rate_429=0.0, failure_rate=0.0, retry_after=1.0, seed=None, stall_rate=0.0, stall_seconds=120.0):
+        self.median_latency = median_latency
+        self.latency_sigma = latency_sigma
+        self.per_token_delay = per_token_delay
+        self.rate_429 = rate_429
+        self.failure_rate = failure_rate
+        self.retry_after = retry_after
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.log = RequestLog()
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _roll(self):
+        with self._random_lock:
+            return self._random.random(), self._random.gauss(0, self.latency_sigma)
+
+    def respond(self, path, body):
+        if not path.endswith("/chat/completions"):
+            return 404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}}, {}
+
+        roll, jitter = self._roll()
+        if roll < self.rate_429:
+            time.sleep(self.median_latency / 10)
+            error = {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}
+            return 429, error, {"Retry-After": str(self.retry_after)}
+        if roll < self.rate_429 + self.failure_rate:
+            time.sleep(self.median_latency)
+            return 500, {"error": {"message": "Internal error", "type": "server_error"}}, {}
+
+        content = self._translate(body)
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in body.get("messages", []))
+        completion_tokens = estimate_tokens(content)
+        if body.get("stream"):
+            return 200, self._events(body, content, prompt_tokens, completion_tokens,
+                                     self.median_latency * math.exp(jitter)), {}
+        time.sleep(self.median_latency * math.exp(jitter) + completion_tokens * self.per_token_delay)
+
+        return 200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }, {}
+
+    def _events(self, body, content, prompt_tokens, completion_tokens, first_token_delay):
+        # (delay, JSON chunk) pairs, roughly four characters per token
+        def chunk(delta, usage=None):
+            return json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None}] if delta is not None else [],
+                "usage": usage,
+            }, ensure_ascii=False)
+
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)] or [""]
+        events = [(first_token_delay, chunk({"role": "assistant", "content": pieces[0]}))]
+        with self._random_lock:
+            stalls = self._random.random() < self.stall_rate
+        if stalls:
+            return events + [(self.stall_seconds, None)]
+        events += [(self.per_token_delay, chunk({"content": piece})) for piece in pieces[1:]]
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        events.append((0.0, chunk(None, usage)))
+        events.append((0.0, "[DONE]"))
+        return events
+
+    def _translate(self, body):
+        user = body["messages"][-1]["content"]
+        text = user.split("\n\n", 1)[-1]
+        if body.get("response_format", {}).get("type") == "json_object":
+            segments = json.loads(text)["segments"]
+            translations = [{"id": s["id"], "text": "EN:" + s["text"]} for s in segments]
+            return json.dumps({"translations": translations}, ensure_ascii=False)
+        return "EN:" + text
+
+class FakeDeepLTranslator:
+    # Stand-in for deepl.Translator.translate_text with a fixed plus per-character delay
+    def __init__(self, latency=0.3, per_char_delay=0.0):
+        self.latency = latency
+        self.per_char_delay = per_char_delay
+        self.log = RequestLog()
+
+    def translate_text(self, texts, target_lang=None, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        started = time.perf_counter()
+        time.sleep(self.latency + self.per_char_delay * sum(len(t) for t in texts))
+        results = [types.SimpleNamespace(text="EN:" + t, detected_source_lang="ZH") for t in texts]
+        self.log.record(time.perf_counter() - started)
+        return results[0] if single else results
+
+class FakeWorksheet:
+    def __init__(self, title, client):
+        self.title = title
+        self.rows = []
+        self._client = client
+
+    def append_rows(self, values, value_input_option=None, **kwargs):
+        self._client._call()
+        json.dumps(values)  # the real client would fail on values that are not JSON serializable
+        self.rows.extend(values)
+
+    def append_row(self, values, value_input_option=None, **kwargs):
+        self.append_rows([values], value_input_option)
+
+class FakeSpreadsheet:
+    def __init__(self, titles, client):
+        self._worksheets = [FakeWorksheet(title, client) for title in titles]
+        self._client = client
+
+    def worksheets(self):
+        self._client._call()
+        return list(self._worksheets)
+
+    def worksheet(self, title):
+        self._client._call()
+        return next(ws for ws in self._worksheets if ws.title == title)
+
+class FakeGspreadClient:
+    # Stand-in for an authorized gspread client: every API call sleeps `latency` and is logged
+    def __init__(self, titles, latency=0.05):
+        self.latency = latency
+        self.log = RequestLog()
+        self.spreadsheet = FakeSpreadsheet(titles, self)
+
+    def _call(self):
+        time.sleep(self.latency)
+        self.log.record(self.latency)
+
+    def open_by_key(self, key):
+        self._call()
+        return self.spreadsheet
@@ -0,0 +1,48 @@
+import random
+import pandas as pd
+from translator import EXPECTED_COLUMNS
+
+_WORDS = [
+    "产品", "展示", "户外", "室内", "自然光", "白色背景", "模特", "女性", "男性", "儿童",
+    "宠物", "厨房", "客厅", "卧室", "使用场景", "特写", "细节", "开箱", "包装", "功能",
+    "演示", "清洁", "安装", "步骤", "对比", "效果", "质感", "材质", "尺寸", "颜色",
+]
+_PRODUCTS = [f"无线{kind}{n}号" for kind in ("耳机", "吸尘器", "台灯", "水杯", "背包") for n in range(10)]
+_SCENES = ["室内", "户外", "厨房", "客厅", "办公室", "花园", "卧室", "浴室", "车内", "健身房"]
+_PETS_KIDS = ["无", "有宠物", "有小孩", "宠物和小孩", None]
+_BOILERPLATE = ["请按照产品说明拍摄，保持画面清晰。", "视频需横屏拍摄，时长不少于30秒。", None]
+
+def _sentence(rng, words):
+    return "，".join(rng.choice(_WORDS) for _ in range(words)) + "。"
+
+def make_dataframe(rows, addresses=50, duplicate_ratio=0.4, seed=0):
+    # Rows shaped like EXPECTED_COLUMNS; duplicate_ratio of the free-text
+    # cells repeat boilerplate, the rest are random sentences
+    rng = random.Random(seed)
+    records = []
+    for i in range(rows):
+        def free_text(max_sentences):
+            if rng.random() < duplicate_ratio:
+                return rng.choice(_BOILERPLATE)
+            return "".join(_sentence(rng, rng.randint(3, 12)) for _ in range(rng.randint(1, max_sentences)))
+
+        records.append([
+            pd.Timestamp("2025-01-01") + pd.Timedelta(days=i % 28),
+            rng.randint(1, addresses),
+            rng.choice(_PRODUCTS),
+            f"B0{rng.randrange(16 ** 8):08X}",
+            rng.choice(["女性模特", "男性模特", "无需模特", None]),
+            rng.randint(1, 5),
+            rng.choice(_SCENES),
+            rng.choice(_PETS_KIDS),
+            free_text(6),
+            free_text(3),
+        ])
+    return pd.DataFrame(records, columns=EXPECTED_COLUMNS)
+
+def make_workbook(path, rows, addresses=50, duplicate_ratio=0.4, seed=0):
+    make_dataframe(rows, addresses, duplicate_ratio, seed).to_excel(path, index=False)
+    return path
+
+def worksheet_titles(addresses=50):
+    return [f"Store {n}" for n in range(1, addresses + 1)] + ["Summary"]
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+def source_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+class CheckpointJournal:
+    """Append-only JSONL record of finished translations for one output file.
+
+    Each line covers one translated text: the column, the row labels it was
+    written to, a hash of the source text and the translation. On resume a
+    cell is only restored if its current source text still has the same hash.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._completed = {}
+        self._lock = threading.Lock()
+
+        if resume:
+            self._load()
+        elif os.path.exists(path):
+            os.remove(path)
+        self._file = open(path, "a", encoding="utf-8")
+
+    @staticmethod
+    def path_for(output_file):
+        return output_file + ".journal.jsonl"
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        entries = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave the last line half-written
+                    continue
+                completed = self._completed.setdefault(entry["column"], {})
+                for row in entry["rows"]:
+                    completed[row] = (entry["source"], entry["text"])
+                entries += 1
+        logging.getLogger().info(f"Loaded {entries} checkpointed translations from {self.path}.")
+
+    def restore(self, df, col, mask):
+        # Writes checkpointed translations into df and returns the mask of cells still to translate
+        completed = self._completed.get(col)
+        if not completed:
+            return mask
+
+        restored = []
+        for row, text in zip(df.index[mask], df.loc[mask, col]):
+            entry = completed.get(str(row))
+            if entry is not None and entry[0] == source_hash(text):
+                df.at[row, col] = entry[1]
+                restored.append(row)
+
+        if restored:
+            logging.getLogger().info(f"Resumed {len(restored)} cells in column '{col}' from checkpoint.")
+        return mask & ~df.index.isin(restored)
+
+    def record(self, col, rows, source_text, translation):
+        line = json.dumps({
+            "column": col,
+            "rows": [str(row) for row in rows],
+            "source": source_hash(source_text),
+            "text": translation,
+        }, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def discard(self):
+        # The run finished and its output is saved, so the journal is no longer needed
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,122 @@
+import atexit
+import importlib.util
+import logging
+import threading
+import deepl
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DEFAULT_CONNECTION_LIMITS
+from requests.adapters import HTTPAdapter, DEFAULT_POOLSIZE
+
+logger = logging.getLogger()
+
+# Idle connections are kept this long so consecutive columns, files and GUI runs reuse them
+KEEPALIVE_EXPIRY = 60.0
+
+# The SDK's httpx.Limits class, taken from its defaults so we don't import its HTTP library directly
+_Limits = type(DEFAULT_CONNECTION_LIMITS)
+
+# Major versions of the deepl SDK whose private requests session was checked
+# to be at translator._client._session; others keep the SDK's own pool
+DEEPL_POOL_SDK_MAJORS = ("1",)
+
+def http2_available():
+    # httpx only speaks HTTP/2 when the optional h2 package is installed
+    return importlib.util.find_spec("h2") is not None
+
+class ClientRegistry:
+    """Long-lived API clients shared by every engine in the process.
+
+    DeepSeek clients are keyed by (api_key, base_url) and get a connection
+    pool as large as the largest concurrency asked for, using HTTP/2 when
+    available.
+    DeepL translators are keyed by auth key, with the SDK's requests pool
+    widened to the DeepL concurrency where the SDK version allows. Clients are created on first use and
+    closed together by close().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._openai = {}
+        self._openai_pool = {}
+        self._deepl = {}
+        self._deepl_pool = {}
+
+    def openai(self, api_key, base_url, concurrency):
+        key = (api_key, base_url)
+        replaced = None
+        with self._lock:
+            client = self._openai.get(key)
+            # A larger pool serves a lower concurrency just as well (the limiter
+            # caps requests in flight), so the client is only replaced to grow it
+            if client is None or self._openai_pool[key] < concurrency:
+                replaced = client
+                http_client = DefaultAsyncHttpxClient(
+                    http2=http2_available(),
+                    limits=_Limits(max_connections=concurrency, max_keepalive_connections=concurrency,
+                                   keepalive_expiry=KEEPALIVE_EXPIRY),
+                )
+                # SDK-level retries are disabled so 429s reach the shared limiter instead of
+                # being retried independently inside each request
+                client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=http_client)
+                self._openai[key] = client
+                self._openai_pool[key] = concurrency
+                logger.info(f"Created DeepSeek client for {base_url} with a pool of {concurrency} connections "
+                            f"({'HTTP/2' if http2_available() else 'HTTP/1.1'}).")
+        if replaced is not None:
+            from async_engine import submit
+
+            # Closed on the loop without waiting, so this is safe to call from it
+            submit(replaced.close())
+        return client
+
+    def deepl(self, auth_key, concurrency):
+        with self._lock:
+            translator = self._deepl.get(auth_key)
+            if translator is None:
+                translator = deepl.Translator(auth_key)
+                self._deepl[auth_key] = translator
+            if self._deepl_pool.get(auth_key, DEFAULT_POOLSIZE) < concurrency:
+                if _widen_deepl_pool(translator, concurrency):
+                    self._deepl_pool[auth_key] = concurrency
+            return translator
+
+    def close(self):
+        from async_engine import run_sync
+
+        with self._lock:
+            openai_clients = list(self._openai.values())
+            deepl_translators = list(self._deepl.values())
+            self._openai.clear()
+            self._openai_pool.clear()
+            self._deepl.clear()
+
+        for client in openai_clients:
+            try:
+                run_sync(client.close())
+            except Exception as e:
+                logger.warning(f"Failed to close DeepSeek client: {e}")
+        for translator in deepl_translators:
+            translator.close()
+
+def _widen_deepl_pool(translator, concurrency):
+    # requests keeps DEFAULT_POOLSIZE (10) connections per host; the SDK call runs
+    # in one thread per in-flight request, so size the pool to the concurrency.
+    # The session is private to the SDK, so it is only touched on checked versions.
+    session = getattr(getattr(translator, "_client", None), "_session", None)
+    if deepl.__version__.split(".")[0] not in DEEPL_POOL_SDK_MAJORS or not hasattr(session, "mount"):
+        logger.warning(f"Cannot widen the DeepL connection pool with deepl {deepl.__version__}; requests beyond "
+                       f"{DEFAULT_POOLSIZE} in flight will open short-lived connections.")
+        return False
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=concurrency))
+    return True
+
+_default = None
+_default_lock = threading.Lock()
+
+def default_registry():
+    # Process-wide registry for callers that don't manage their own; closed at exit
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ClientRegistry()
+            atexit.register(_default.close)
+        return _default
@@ -0,0 +1,162 @@
+import datetime
+import json
+import logging
+import os
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet/Arrow support is optional; xlsx always works
+    pa = None
+    pq = None
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+ARROW_SUFFIXES = (".arrow", ".feather")
+
+# Schema metadata keys recording which input file a staged frame was built from,
+# and which of its columns were object columns (see save_stage)
+_SOURCE_KEY = b"translator.source"
+_OBJECT_COLUMNS_KEY = b"translator.object_columns"
+
+def columnar_available():
+    return pa is not None
+
+def is_columnar(path):
+    return path.lower().endswith(PARQUET_SUFFIXES + ARROW_SUFFIXES)
+
+def _require_pyarrow(path):
+    if pa is None:
+        raise RuntimeError(f"Reading or writing {os.path.basename(path)} needs pyarrow (pip install pyarrow).")
+
+def _is_text(series):
+    return pd.api.types.infer_dtype(series, skipna=True) == "string"
+
+def arrow_strings(df):
+    # Object columns holding only text as Arrow-backed strings: compact, and
+    # vectorized string operations run in Arrow. Already the default for pandas 3
+    # with pyarrow. Columns mixing numbers and text are left alone.
+    if pa is None:
+        return df
+    for col in df.columns:
+        if df[col].dtype == object and _is_text(df[col]):
+            df[col] = df[col].astype("string[pyarrow]")
+    return df
+
+def _mixed_as_text(df):
+    # Parquet and Arrow need one type per column, so an output file gets the
+    # mixed columns (such as Address with 12 and "12A") as text
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+def read_table(path):
+    # xlsx via openpyxl, or Parquet / Arrow IPC (Feather) by file extension
+    lower = path.lower()
+    if lower.endswith(PARQUET_SUFFIXES):
+        _require_pyarrow(path)
+        return pd.read_parquet(path)
+    if lower.endswith(ARROW_SUFFIXES):
+        _require_pyarrow(path)
+        return pd.read_feather(path)
+    return pd.read_excel(path)
+
+def write_table(df, path):
+    lower = path.lower()
+    if lower.endswith(PARQUET_SUFFIXES):
+        _require_pyarrow(path)
+        _mixed_as_text(arrow_strings(df)).to_parquet(path, index=False)
+    elif lower.endswith(ARROW_SUFFIXES):
+        _require_pyarrow(path)
+        _mixed_as_text(arrow_strings(df)).reset_index(drop=True).to_feather(path)
+    else:
+        df.to_excel(path, index=False)
+
+def _source_fingerprint(source_file):
+    stat = os.stat(source_file)
+    return f"{os.path.abspath(source_file)}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8")
+
+def staging_path(output_file, stage):
+    return f"{output_file}.{stage}.parquet"
+
+def _encode_cell(value):
+    # A cell of a mixed column as JSON tagged with its type, so it loads back as
+    # the same int, float, date or text instead of a string
+    if value is None or value is pd.NaT or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return json.dumps(["bool", bool(value)])
+    if isinstance(value, (int, np.integer)):
+        return json.dumps(["int", int(value)])
+    if isinstance(value, (float, np.floating)):
+        return json.dumps(["float", float(value)])
+    if isinstance(value, datetime.datetime):
+        return json.dumps(["datetime", value.isoformat()])
+    if isinstance(value, datetime.date):
+        return json.dumps(["date", value.isoformat()])
+    if isinstance(value, datetime.time):
+        return json.dumps(["time", value.isoformat()])
+    return json.dumps(["str", str(value)])
+
+_DECODERS = {
+    "bool": bool, "int": int, "float": float, "str": str,
+    "datetime": datetime.datetime.fromisoformat, "date": datetime.date.fromisoformat,
+    "time": datetime.time.fromisoformat,
+}
+
+def _decode_cell(value):
+    # Blank cells come back as NaN, as read_excel gives them
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return np.nan
+    kind, raw = json.loads(value)
+    return _DECODERS[kind](raw)
+
+def save_stage(df, path, source_file):
+    # Parquet copy of an intermediate frame, tagged with the size and mtime of
+    # the input it came from so an edited input is never served from a stale copy.
+    # Object columns are restored as such on load, mixed ones cell by cell, so a
+    # run from the staged frame writes the same output as a fresh one.
+    if pa is None:
+        return False
+    df = df.copy()
+    object_columns = [col for col in df.columns if df[col].dtype == object]
+    mixed = [col for col in object_columns
+             if pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty")]
+    for col in mixed:
+        df[col] = pd.Series([_encode_cell(v) for v in df[col]], index=df.index, dtype=object)
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    metadata = dict(table.schema.metadata or {})
+    metadata[_SOURCE_KEY] = _source_fingerprint(source_file)
+    metadata[_OBJECT_COLUMNS_KEY] = json.dumps({"object": object_columns, "mixed": mixed}).encode("utf-8")
+    tmp_path = path + ".tmp"
+    pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+    os.replace(tmp_path, path)
+    return True
+
+def load_stage(path, source_file):
+    # The staged frame, or None if there is none or its input has changed since
+    if pa is None or not os.path.exists(path):
+        return None
+    try:
+        table = pq.read_table(path)
+    except Exception as e:
+        logging.getLogger().warning(f"Ignoring unreadable staged file {path}: {e}")
+        return None
+    metadata = table.schema.metadata or {}
+    if metadata.get(_SOURCE_KEY) != _source_fingerprint(source_file) or _OBJECT_COLUMNS_KEY not in metadata:
+        return None
+    columns = json.loads(metadata[_OBJECT_COLUMNS_KEY])
+    df = table.to_pandas()
+    for col in columns["object"]:
+        df[col] = df[col].astype(object)
+    for col in columns["mixed"]:
+        df[col] = pd.Series([_decode_cell(v) for v in df[col]], index=df.index, dtype=object)
+    return df
+
+def load_translated(output_file):
+    # A finished output for re-opening or the Sheets export: the staged Parquet
+    # copy when the output has not changed since, otherwise the output itself
+    staged = load_stage(staging_path(output_file, "translated"), output_file) if os.path.exists(output_file) else None
+    return staged if staged is not None else read_table(output_file)
@@ -0,0 +1,53 @@
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from translator import EXPECTED_COLUMNS
+
+DEFAULT_CHUNK_ROWS = 5000
+
+def iter_excel_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS, columns=EXPECTED_COLUMNS):
+    # Yields DataFrames of at most chunk_rows rows from the first worksheet using a
+    # read-only workbook, so only one chunk is held in memory. Like the
+    # non-streaming path, the header row is skipped and columns are named by
+    # position. The index keeps counting across chunks so row labels stay unique.
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        next(rows, None)
+
+        chunk = []
+        start = 0
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            row = tuple(row[:len(columns)])
+            chunk.append(row + (None,) * (len(columns) - len(row)))
+            if len(chunk) >= chunk_rows:
+                yield pd.DataFrame(chunk, columns=columns, index=range(start, start + len(chunk)))
+                start += len(chunk)
+                chunk = []
+
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns, index=range(start, start + len(chunk)))
+    finally:
+        workbook.close()
+
+class StreamingExcelWriter:
+    # Write-only workbook: appended rows are spooled to a temporary file by
+    # openpyxl instead of being kept in memory until save.
+    def __init__(self, path):
+        self.path = path
+        self.rows_written = 0
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet()
+        self._header_written = False
+
+    def append(self, df):
+        if not self._header_written:
+            self._sheet.append(list(df.columns))
+            self._header_written = True
+        for row in df.itertuples(index=False):
+            self._sheet.append([None if pd.isna(value) else value for value in row])
+        self.rows_written += len(df)
+
+    def close(self):
+        self._workbook.save(self.path)
@@ -1,21 +1,57 @@
 #deepseek version without gui
 
-import pandas as pd
-import deepl
 import logging
 import os
 import sys
-import time
-import random
-from openai import OpenAI
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from pipeline import process_workbook, column_routing, load_preprocessed
+from planner import plan_translation, format_plan, load_latencies
+from columnar import staging_path
+from backends import load_routing, DEFAULT_ROUTING_PATH
+from text_filters import TextFilter, DEFAULT_TEXT_FILTER
+from translation_cache import TranslationCache
+from async_engine import AsyncTranslationEngine, DEFAULT_CONCURRENCY, DEFAULT_DEEPL_CONCURRENCY, DEFAULT_STALL_TIMEOUT
+from clients import default_registry
+from prompts import DEEPSEEK_PROMPT_VERSION
+from metrics import RunMetrics
+from progress import ProgressPrinter, format_progress
+from service import ServiceClient
 
 # --- Configuration ---
 INPUT_FILE = "test_data.xlsx"
 OUTPUT_FILE = "translated_output.xlsx"
 DEEPL_AUTH_KEY = os.getenv("DEEPL_AUTH_KEY")
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-TARGET_LANG = "EN-US"
+DEEPSEEK_CONCURRENCY = int(os.getenv("DEEPSEEK_CONCURRENCY", DEFAULT_CONCURRENCY))
+DEEPSEEK_PACKED = os.getenv("DEEPSEEK_PACKED", "0") == "1"
+# Optional shared rate limits for DeepSeek (unset = concurrency limit only)
+DEEPSEEK_RPS = float(os.getenv("DEEPSEEK_RPS", "0")) or None
+DEEPSEEK_TPM = int(os.getenv("DEEPSEEK_TPM", "0")) or None
+# Stream DeepSeek replies, aborting requests with no new token for DEEPSEEK_STALL_TIMEOUT
+# seconds; DEEPSEEK_HEDGE_PERCENTILE (e.g. 95) duplicates requests slower than that percentile
+DEEPSEEK_STREAM = os.getenv("DEEPSEEK_STREAM", "0") == "1"
+DEEPSEEK_STALL_TIMEOUT = float(os.getenv("DEEPSEEK_STALL_TIMEOUT", DEFAULT_STALL_TIMEOUT))
+DEEPSEEK_HEDGE_PERCENTILE = float(os.getenv("DEEPSEEK_HEDGE_PERCENTILE", "0")) or None
+# Reuse translations journaled by a previous, interrupted run
+RESUME = os.getenv("RESUME", "0") == "1"
+# Only translate rows added or edited since the last INCREMENTAL=1 run (per-row manifest next to the output)
+INCREMENTAL = os.getenv("INCREMENTAL", "0") == "1"
+# INPUT_FILE / OUTPUT_FILE may also be .parquet or .arrow; STAGE=1 keeps Parquet copies of the
+# preprocessed and translated frames next to the output so re-runs skip parsing the workbook
+STAGE = os.getenv("STAGE", "0") == "1"
+# DRY_RUN=1 prints the estimated requests, tokens, cost and wall time (using the latencies
+# measured in METRICS_FILE by the last run) and exits without calling any API
+DRY_RUN = os.getenv("DRY_RUN", "0") == "1"
+# Hand the workbook to a running translation service (service.py) instead of translating here
+TRANSLATION_SERVICE_URL = os.getenv("TRANSLATION_SERVICE_URL")
+# Rows per chunk for streaming very large workbooks (0 = load the whole workbook)
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "0"))
+# Run metrics are always written as JSON; set METRICS_PROMETHEUS_FILE to also
+# export them in Prometheus text format (e.g. for node_exporter's textfile collector)
+METRICS_FILE = os.getenv("METRICS_FILE", "translation_metrics.json")
+METRICS_PROMETHEUS_FILE = os.getenv("METRICS_PROMETHEUS_FILE")
+# Extra backends, per-column routing and passthrough values (see backends.load_routing
+# and text_filters.TextFilter.from_config); used if the file exists
+BACKENDS_CONFIG = os.getenv("BACKENDS_CONFIG", DEFAULT_ROUTING_PATH)
 
 # Setup logging
 logging.basicConfig(
@@ -28,109 +64,52 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Expected columns
-EXPECTED_COLUMNS = ['Date', 'Address', 'Product', 'ASIN', 'Model_Requirements', 'Total_Video', 'Scene', 'Pets_Kids', 'Requirements', 'Comments']
-
-def retry_with_backoff(func, retries=3, base_delay=1.0, max_delay=5.0):
-    for attempt in range(retries):
-        try:
-            return func()
-        except Exception as e:
-            if attempt == retries - 1:
-                raise e
-            delay = min(base_delay * (2 ** attempt), max_delay) + random.uniform(0, 1)
-            time.sleep(delay)
-
-def translate_column_deepl(df, col, translator, batch=False, batch_size=50):
-    if col not in df.columns:
-        logger.warning(f"Column '{col}' not found, skipping.")
-        return df
-
-    df[col] = df[col].astype(str).fillna('')
-    mask = df[col] != ""
-    texts_to_translate = df.loc[mask, col].tolist()
-
-    if not texts_to_translate:
-        logger.info(f"No non-empty values to translate in column '{col}'.")
-        return df
-
-    logger.info(f"Translating {len(texts_to_translate)} entries in column '{col}' using DeepL...")
-
-    translated = []
-
+def write_metrics(metrics):
+    logger.info(metrics.summary())
     try:
-        if not batch:
-            translations = translator.translate_text(texts_to_translate, target_lang=TARGET_LANG)
-            translated = [t.text for t in translations]
-        else:
-            for i in range(0, len(texts_to_translate), batch_size):
-                chunk = texts_to_translate[i:i + batch_size]
-                chunk_translations = translator.translate_text(chunk, target_lang=TARGET_LANG)
-                translated.extend([t.text for t in chunk_translations])
+        metrics.to_json(METRICS_FILE)
+        if METRICS_PROMETHEUS_FILE:
+            metrics.to_prometheus(METRICS_PROMETHEUS_FILE)
+        logger.info(f"Run metrics saved to: {METRICS_FILE}")
     except Exception as e:
-        logger.error(f"DeepL translation failed for column '{col}': {e}")
-        return df
-
-    df.loc[mask, col] = translated
-    return df
-
-def translate_column_deepseek(df, col, api_key, max_workers=5):
-    if col not in df.columns:
-        logger.warning(f"Column '{col}' not found, skipping.")
-        return df
-
-    df[col] = df[col].astype(str).fillna('')
-    mask = df[col] != ""
-    texts_to_translate = df.loc[mask, col].tolist()
-
-    if not texts_to_translate:
-        logger.info(f"No non-empty values to translate in column '{col}'.")
-        return df
-
-    logger.info(f"Translating {len(texts_to_translate)} entries in column '{col}' using DeepSeek with {max_workers} threads...")
-
-    client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
-
-    def translate_text(text):
-        def call_api():
-            response = client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": (
-                        "You are a professional, accurate, and natural translator. \n"
-                        "Do not add any introductions, commentary, or explanations. Only output the translated English text."
-                    )},
-                    {"role": "user", "content": f"Translate this Chinese text to fluent English:\n\n{text}"}
-                ],
-                stream=False
-            )
-            return response.choices[0].message.content.strip()
+        logger.error(f"Failed to save run metrics: {e}")
 
-        try:
-            return retry_with_backoff(call_api)
-        except Exception as e:
-            logger.error(f"DeepSeek translation failed for text: {e}")
-            return text  # fallback to original
+def translate_via_service():
+    client = ServiceClient(TRANSLATION_SERVICE_URL)
 
-    # Perform translations in parallel
-    translated = [None] * len(texts_to_translate)
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(translate_text, text): idx for idx, text in enumerate(texts_to_translate)}
-        for future in as_completed(futures):
-            idx = futures[future]
-            translated[idx] = future.result()
+    def report(status):
+        if "progress" in status:
+            print(f"\r{status['status']}: {format_progress(status['progress'])}", end="", file=sys.stderr, flush=True)
 
-    df.loc[mask, col] = translated
-    return df
+    try:
+        status = client.translate(INPUT_FILE, OUTPUT_FILE, packed=DEEPSEEK_PACKED, incremental=INCREMENTAL,
+                                  on_status=report)
+    except (OSError, RuntimeError) as e:
+        print(file=sys.stderr)
+        logger.error(f"Translation via {TRANSLATION_SERVICE_URL} failed: {e}")
+        sys.exit(1)
+    print(file=sys.stderr)
+    logger.info(f"Service translated {status['rows']} rows. Output saved to: {OUTPUT_FILE}")
 
 def main():
     logger.info("Translation script started.")
 
-    if not DEEPL_AUTH_KEY:
+    if TRANSLATION_SERVICE_URL and not DRY_RUN:
+        if not os.path.exists(INPUT_FILE):
+            logger.error(f"Input file not found: {INPUT_FILE}")
+            sys.exit(1)
+        translate_via_service()
+        return
+
+    # A dry run calls no API, so it works without keys
+    deepl_auth_key = DEEPL_AUTH_KEY or ("estimate" if DRY_RUN else None)
+    deepseek_api_key = DEEPSEEK_API_KEY or ("estimate" if DRY_RUN else None)
+
+    if not deepl_auth_key:
         logger.error("DEEPL_AUTH_KEY environment variable is not set.")
         sys.exit(1)
 
-    if not DEEPSEEK_API_KEY:
+    if not deepseek_api_key:
         logger.error("DEEPSEEK_API_KEY environment variable is not set.")
         sys.exit(1)
 
@@ -138,54 +117,60 @@ def main():
         logger.error(f"Input file not found: {INPUT_FILE}")
         sys.exit(1)
 
-    try:
-        df = pd.read_excel(INPUT_FILE)
-        logger.info(f"Loaded worksheet with {len(df)} rows.")
-    except Exception as e:
-        logger.error(f"Failed to read Excel file: {e}")
-        sys.exit(1)
-
-    # missing_cols = [col for col in EXPECTED_COLUMNS if col not in df.columns]
-    # if missing_cols:
-    #     logger.error(f"Missing expected columns: {missing_cols}")
-    #     sys.exit(1)
-
-    df.columns = EXPECTED_COLUMNS
-
-    # Preprocessing
-    df['Model_Requirements'] = df['Model_Requirements'].fillna('N/A')
-    df['Scene'] = df['Scene'].fillna('N/A').astype(str)
-    df['Pets_Kids'] = df['Pets_Kids'].fillna('N/A').astype(str)
-    df['Shooting_Requirements'] = (
-        df['Comments'].fillna('').astype(str) + '\n' +
-        df['Requirements'].fillna('').astype(str)
-    )
-    df.drop(columns=['Comments', 'Requirements'], inplace=True)
-
     # Initialize translators
     try:
-        deepl_translator = deepl.Translator(DEEPL_AUTH_KEY)
+        deepl_translator = default_registry().deepl(deepl_auth_key, DEFAULT_DEEPL_CONCURRENCY)
     except Exception as e:
         logger.error(f"Failed to initialize DeepL translator: {e}")
         sys.exit(1)
 
-    # Translate using DeepL
-    for column in ['Product', 'Model_Requirements', 'Scene', 'Pets_Kids']:
-        df = translate_column_deepl(df, column, deepl_translator, batch=False)
-
-    # Translate using DeepSeek
-    df = translate_column_deepseek(df, 'Shooting_Requirements', api_key=DEEPSEEK_API_KEY)
-
-    # Format the Date column to avoid time component
-    if 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce').dt.strftime('%m/%d/%Y')
+    backends, columns, text_filter = [], {}, DEFAULT_TEXT_FILTER
+    if os.path.exists(BACKENDS_CONFIG):
+        try:
+            backends, columns = load_routing(BACKENDS_CONFIG, default_registry())
+            text_filter = TextFilter.from_config(BACKENDS_CONFIG)
+        except Exception as e:
+            logger.error(f"Failed to load backend config {BACKENDS_CONFIG}: {e}")
+            sys.exit(1)
+        logger.info(f"Loaded backend config {BACKENDS_CONFIG}.")
+
+    cache = TranslationCache()
+    cache.invalidate("deepseek", keep_prompt_version=DEEPSEEK_PROMPT_VERSION)
+    engine = AsyncTranslationEngine(
+        deepseek_api_key=deepseek_api_key, deepl_translator=deepl_translator, concurrency=DEEPSEEK_CONCURRENCY,
+        requests_per_second=DEEPSEEK_RPS, tokens_per_minute=DEEPSEEK_TPM, metrics=RunMetrics(),
+        backends=backends, text_filter=text_filter, stream=DEEPSEEK_STREAM, stall_timeout=DEEPSEEK_STALL_TIMEOUT,
+        hedge_percentile=DEEPSEEK_HEDGE_PERCENTILE
+    )
 
-    # Output to Excel
+    if DRY_RUN:
+        try:
+            df = load_preprocessed(INPUT_FILE, engine.metrics,
+                                   staging_path(OUTPUT_FILE, "preprocessed") if STAGE else None)
+            plan = plan_translation(df, engine, column_routing(columns), cache=cache,
+                                    latencies=load_latencies(METRICS_FILE), packed=DEEPSEEK_PACKED)
+        except Exception as e:
+            logger.error(f"Planning failed: {e}")
+            sys.exit(1)
+        finally:
+            engine.close()
+            cache.close()
+        print(format_plan(plan))
+        return
+
+    # Compact progress line on stderr, sampled twice a second
+    progress = ProgressPrinter(engine.progress, engine).start()
     try:
-        df.to_excel(OUTPUT_FILE, index=False)
-        logger.info(f"Translation completed. Output saved to: {OUTPUT_FILE}")
+        process_workbook(INPUT_FILE, OUTPUT_FILE, engine, cache=cache, resume=RESUME, incremental=INCREMENTAL, stage=STAGE,
+                         chunk_rows=STREAM_CHUNK_ROWS, packed=DEEPSEEK_PACKED, column_engines=column_routing(columns))
     except Exception as e:
-        logger.error(f"Failed to save output file: {e}")
+        logger.error(f"Translation failed: {e}")
+        sys.exit(1)
+    finally:
+        progress.stop()
+        engine.close()
+        cache.close()
+        write_metrics(engine.metrics)
 
     logger.info("Translation script finished.")
 
@@ -13,37 +13,37 @@ from openai import OpenAI
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import deepl
 import sys
+from logger import TextHandler
+from backends import size_batches
+from rate_limiter import is_account_error, is_transient
+from progress import format_progress
+from service import ServiceClient, DEFAULT_SERVICE_URL
 
 # --- Logger Setup ---
-class TextHandler(logging.Handler):
-    def __init__(self, text_widget):
-        super().__init__()
-        self.text_widget = text_widget
-
-    def emit(self, record):
-        msg = self.format(record)
-        self.text_widget.configure(state='normal')
-        self.text_widget.insert(tk.END, msg + '\n')
-        self.text_widget.configure(state='disabled')
-        self.text_widget.yview(tk.END)
-
 logger = logging.getLogger("translator_gui")
 logger.setLevel(logging.INFO)
 
 EXPECTED_COLUMNS = ['Date', 'Address', 'Product', 'ASIN', 'Model_Requirements', 'Total_Video', 'Scene', 'Pets_Kids', 'Requirements', 'Comments']
 
+# DeepL requests in flight per column
+DEEPL_WORKERS = 8
+
+# Seconds between progress lines while a job runs on the translation service
+SERVICE_LOG_INTERVAL = 10
+
 # --- Translation Helpers ---
 def retry_with_backoff(func, retries=3, base_delay=1.0, max_delay=5.0):
     for attempt in range(retries):
         try:
             return func()
         except Exception as e:
-            if attempt == retries - 1:
+            # A bad key or exhausted quota fails the same way on every attempt
+            if attempt == retries - 1 or is_account_error(e):
                 raise e
             delay = min(base_delay * (2 ** attempt), max_delay) + random.uniform(0, 1)
             time.sleep(delay)
 
-def translate_column_deepl(df, col, translator):
+def translate_column_deepl(df, col, translator, max_workers=DEEPL_WORKERS):
     if col not in df.columns:
         logger.warning(f"Column '{col}' not found, skipping.")
         return df
@@ -58,12 +58,40 @@ def translate_column_deepl(df, col, translator):
 
     logger.info(f"Translating {len(texts_to_translate)} entries in column '{col}' using DeepL...")
 
-    try:
-        translations = translator.translate_text(texts_to_translate, target_lang="EN-US")
-        df.loc[mask, col] = [t.text for t in translations]
-    except Exception as e:
-        logger.error(f"DeepL translation failed for column '{col}': {e}")
+    account_failed = threading.Event()
+
+    def translate_chunk(start, end):
+        # Returns (index, translation) pairs; a failed chunk is split in half and
+        # retried so one bad text does not cost the rest of the chunk. Account
+        # errors are not split: they stop every remaining chunk of the column.
+        # Outages and rate limits are not split either, as that only adds load.
+        if account_failed.is_set():
+            return []
+        chunk = texts_to_translate[start:end]
+        try:
+            translations = retry_with_backoff(lambda: translator.translate_text(chunk, target_lang="EN-US"))
+            return [(start + i, t.text) for i, t in enumerate(translations)]
+        except Exception as e:
+            if is_account_error(e):
+                if not account_failed.is_set():
+                    account_failed.set()
+                    logger.error(f"DeepL rejected the account, column '{col}' is left untranslated: {e}")
+                return []
+            if end - start == 1 or is_transient(e):
+                logger.error(f"DeepL translation failed for {end - start} text(s): {e}")
+                return []
+            middle = (start + end) // 2
+            return translate_chunk(start, middle) + translate_chunk(middle, end)
+
+    # Chunks stay within DeepL's per-request text count and body size limits
+    translated = list(texts_to_translate)  # fallback to the original text
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(translate_chunk, start, end) for start, end in size_batches(texts_to_translate)]
+        for future in as_completed(futures):
+            for idx, text in future.result():
+                translated[idx] = text
 
+    df.loc[mask, col] = translated
     return df
 
 def translate_column_deepseek(df, col, api_key, max_workers):
@@ -152,6 +180,12 @@ class TranslatorApp:
         self.threads_entry.insert(0, "5")
         self.threads_entry.grid(row=3, column=1, sticky='w', padx=5)
 
+        # A running service.py translates with its own keys and shares one quota between operators
+        self.service_url = os.getenv("TRANSLATION_SERVICE_URL", DEFAULT_SERVICE_URL)
+        self.service_var = tk.BooleanVar(value=ServiceClient(self.service_url, timeout=1).available())
+        ttk.Checkbutton(frame, text=f"Use translation service at {self.service_url}",
+                        variable=self.service_var).grid(row=5, column=0, columnspan=3, sticky='w', padx=5)
+
         ttk.Button(frame, text="Run Translation", command=self.run_translation).grid(row=4, column=1, pady=15)
 
         self.log_area = scrolledtext.ScrolledText(self.root, wrap='word', width=100, height=25, state='disabled', font=("Consolas", 10))
@@ -162,10 +196,8 @@ class TranslatorApp:
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
         handler.setFormatter(formatter)
 
-        # Our app-specific logger
-        logger.addHandler(handler)
-
-        # Attach handler to root logger so SDKs and libs emit to GUI
+        # Attach handler to root logger so SDKs and libs emit to GUI;
+        # the app-specific logger propagates to it
         root_logger = logging.getLogger()
         root_logger.setLevel(logging.INFO)  # or DEBUG if needed
         root_logger.addHandler(handler)
@@ -180,8 +212,33 @@ class TranslatorApp:
         thread = threading.Thread(target=self.translate)
         thread.start()
 
+    def translate_via_service(self, input_file):
+        output_file = os.path.splitext(input_file)[0] + "_translated.xlsx"
+        last_logged = {"status": None, "at": 0.0}
+
+        def report(status):
+            now = time.monotonic()
+            if status["status"] != last_logged["status"] or now - last_logged["at"] >= SERVICE_LOG_INTERVAL:
+                progress = format_progress(status["progress"]) if "progress" in status else ""
+                logger.info(f"Service job {status['id']} {status['status']} {progress}")
+                last_logged.update(status=status["status"], at=now)
+
+        try:
+            status = ServiceClient(self.service_url).translate(input_file, output_file, on_status=report)
+        except Exception as e:
+            logger.error(f"Translation via {self.service_url} failed: {e}")
+            return
+        logger.info(f"Service translated {status['rows']} rows. Output saved to: {output_file}")
+
     def translate(self):
         input_file = self.file_entry.get()
+        if self.service_var.get():
+            if not input_file:
+                messagebox.showerror("Error", "Excel file is required.")
+                return
+            self.translate_via_service(input_file)
+            return
+
         deepl_auth = self.deepl_key.get()
         deepseek_auth = self.deepseek_key.get()
         threads = int(self.threads_entry.get())
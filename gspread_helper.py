@@ -1,12 +1,20 @@
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 import logging
+import time
+import pandas as pd
 
 SHEET_COLUMNS = [
     'Date', 'Product', 'ASIN', 'Model_Requirements',
     'Total_Video', 'Scene', 'Pets_Kids', 'Shooting_Requirements'
 ]
 
+# Rows per append_rows request, and the minimum gap between write requests to
+# stay under the Sheets API write quota (60 requests per minute per user). The
+# quota is per user, not per worksheet, so one WritePacer spaces all writes of a run.
+DEFAULT_APPEND_CHUNK_ROWS = 500
+DEFAULT_WRITE_INTERVAL = 1.0
+
 def setup_gspread_client(credentials_path):
     scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
     creds = ServiceAccountCredentials.from_json_keyfile_name(credentials_path, scope)
@@ -21,3 +29,42 @@ def append_row_to_sheet(gc, spreadsheet_id, worksheet_name, row_data_dict):
         logging.info(f"Appended row to {worksheet_name}: {row_data}")
     except Exception as e:
         logging.error(f"Failed to append to {worksheet_name}: {e}")
+
+def _cell_value(value):
+    # numpy scalars and NaN are not JSON serializable
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return value.item() if hasattr(value, "item") else value
+
+def row_values(row_data_dict):
+    return [_cell_value(row_data_dict.get(col, "")) for col in SHEET_COLUMNS]
+
+class WritePacer:
+    def __init__(self, min_interval=DEFAULT_WRITE_INTERVAL):
+        self.min_interval = min_interval
+        self.last_write = None
+
+    def wait(self):
+        # Sleeps until min_interval has passed since the previous write, then marks this one
+        if self.last_write is not None:
+            wait = self.min_interval - (time.monotonic() - self.last_write)
+            if wait > 0:
+                time.sleep(wait)
+        self.last_write = time.monotonic()
+
+def append_rows_to_sheet(worksheet, rows, chunk_rows=DEFAULT_APPEND_CHUNK_ROWS, pacer=None):
+    # Appends rows with one append_rows call per chunk on an already opened
+    # worksheet, paced by pacer (pass the same one for every worksheet of a run).
+    # Returns the rows whose chunk failed so callers can report them.
+    pacer = pacer or WritePacer()
+    failed_rows = []
+    for i in range(0, len(rows), chunk_rows):
+        chunk = rows[i:i + chunk_rows]
+        pacer.wait()
+        try:
+            worksheet.append_rows([row_values(row) for row in chunk], value_input_option='USER_ENTERED')
+            logging.info(f"Appended {len(chunk)} rows to {worksheet.title}")
+        except Exception as e:
+            logging.error(f"Failed to append {len(chunk)} rows to {worksheet.title}: {e}")
+            failed_rows.extend(chunk)
+    return failed_rows
@@ -2,11 +2,24 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext, ttk
 import threading
 import os
+import time
 import pandas as pd
-import deepl
-from translator import EXPECTED_COLUMNS, translate_column_deepl, translate_column_deepseek
+from pipeline import postprocess_dataframe, translate_dataframe, load_preprocessed, column_routing, COLUMN_ENGINES
+from backends import load_routing, DEFAULT_ROUTING_PATH
+from text_filters import TextFilter, DEFAULT_TEXT_FILTER
+from async_engine import AsyncTranslationEngine, DEFAULT_CONCURRENCY, DEFAULT_DEEPL_CONCURRENCY
+from clients import ClientRegistry
 from logger import setup_gui_logger
 from sheets_writer import write_to_google_sheets
+from translation_cache import TranslationCache
+from prompts import DEEPSEEK_PROMPT_VERSION
+from checkpoint import CheckpointJournal
+from incremental import IncrementalManifest
+from columnar import write_table, is_columnar, staging_path, save_stage, load_translated
+from planner import plan_translation, format_plan, load_latencies
+from metrics import RunMetrics
+from progress import ProgressTracker, format_progress, DEFAULT_INTERVAL
+from service import ServiceClient, RemoteProgress, DEFAULT_SERVICE_URL
 
 class TranslatorApp:
     def __init__(self, root):
@@ -16,9 +29,20 @@ class TranslatorApp:
         self.root.configure(padx=15, pady=15)
 
         self.translated_df = None  # Store translated DataFrame for export step
+        self.metrics = None  # Metrics of the last run, extended by the export step
+        self.engine = None  # Engine of the run in progress, sampled for the progress display
+        self.progress = None
         self.create_widgets()
         self.logger = setup_gui_logger(self.log_area)
 
+        # Translation memory shared across runs; drop entries from older DeepSeek prompts
+        self.cache = TranslationCache()
+        self.cache.invalidate("deepseek", keep_prompt_version=DEEPSEEK_PROMPT_VERSION)
+
+        # API clients and their connection pools are kept across runs and closed with the window
+        self.clients = ClientRegistry()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
     def create_widgets(self):
         frame = ttk.Frame(self.root)
         frame.pack(fill='x', pady=5)
@@ -36,12 +60,31 @@ class TranslatorApp:
         self.deepseek_key = ttk.Entry(frame, width=50, show="*")
         self.deepseek_key.grid(row=2, column=1, padx=5)
 
-        ttk.Label(frame, text="Worker Threads:").grid(row=3, column=0, sticky='e', padx=5, pady=5)
+        ttk.Label(frame, text="Concurrent Requests:").grid(row=3, column=0, sticky='e', padx=5, pady=5)
         self.threads_entry = ttk.Entry(frame, width=10)
-        self.threads_entry.insert(0, "5")
+        self.threads_entry.insert(0, str(DEFAULT_CONCURRENCY))
         self.threads_entry.grid(row=3, column=1, sticky='w', padx=5)
 
-        ttk.Button(frame, text="Run Translation", command=self.run_translation).grid(row=4, column=1, pady=15)
+        self.packed_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frame, text="Batch DeepSeek requests", variable=self.packed_var).grid(row=3, column=2, sticky='w', padx=5)
+
+        self.resume_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frame, text="Resume previous run", variable=self.resume_var).grid(row=4, column=2, sticky='w', padx=5)
+
+        self.incremental_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frame, text="Only translate changed rows",
+                        variable=self.incremental_var).grid(row=4, column=0, sticky='w', padx=5)
+
+        # A running service.py translates with its own keys, cache and limits
+        self.service_url = os.getenv("TRANSLATION_SERVICE_URL", DEFAULT_SERVICE_URL)
+        self.service_var = tk.BooleanVar(value=ServiceClient(self.service_url, timeout=1).available())
+        ttk.Checkbutton(frame, text=f"Use translation service at {self.service_url}",
+                        variable=self.service_var).grid(row=5, column=0, columnspan=3, sticky='w', padx=5)
+
+        buttons = ttk.Frame(frame)
+        buttons.grid(row=4, column=1, pady=15)
+        ttk.Button(buttons, text="Estimate", command=self.run_estimate).pack(side='left', padx=5)
+        ttk.Button(buttons, text="Run Translation", command=self.run_translation).pack(side='left', padx=5)
 
         # Google Sheets section (hidden until translation is done)
         self.sheet_id_label = ttk.Label(frame, text="Google Sheet ID:")
@@ -53,14 +96,46 @@ class TranslatorApp:
 
         self.write_button = ttk.Button(frame, text="Write to Google Sheets", command=self.run_write_to_google_sheets)
 
+        # Progress bars, refreshed from the Tk loop while a run is in progress
+        progress_frame = ttk.Frame(self.root)
+        progress_frame.pack(fill='x', pady=5)
+        progress_frame.columnconfigure(1, weight=1)
+        self.overall_bar = ttk.Progressbar(progress_frame, maximum=1)
+        self.overall_bar.grid(row=0, column=0, columnspan=3, sticky='ew', padx=5, pady=2)
+        self.status_label = ttk.Label(progress_frame, text="Idle")
+        self.status_label.grid(row=1, column=0, columnspan=3, sticky='w', padx=5)
+        self.column_bars = {}
+        for i, col in enumerate(COLUMN_ENGINES, start=2):
+            ttk.Label(progress_frame, text=col).grid(row=i, column=0, sticky='w', padx=5)
+            bar = ttk.Progressbar(progress_frame, maximum=1)
+            bar.grid(row=i, column=1, sticky='ew', padx=5, pady=1)
+            count = ttk.Label(progress_frame, text="", width=16)
+            count.grid(row=i, column=2, sticky='e', padx=5)
+            self.column_bars[col] = (bar, count)
+
         self.log_area = scrolledtext.ScrolledText(self.root, wrap='word', width=100, height=25, state='disabled', font=("Consolas", 10))
         self.log_area.pack(fill='both', expand=True, padx=5, pady=5)
 
+    def on_close(self):
+        self.clients.close()
+        self.cache.close()
+        self.root.destroy()
+
     def browse_file(self):
-        filename = filedialog.askopenfilename(filetypes=[("Excel Files", "*.xlsx")])
+        filename = filedialog.askopenfilename(filetypes=[("Excel Files", "*.xlsx"),
+                                                         ("Parquet / Arrow Files", "*.parquet *.arrow *.feather")])
         if filename:
             self.file_entry.delete(0, tk.END)
             self.file_entry.insert(0, filename)
+            # A file translated earlier can be exported again without re-translating;
+            # its output is only loaded once the export is started
+            self.translated_df = None
+            self.metrics = None
+            output_file = self.output_path(filename)
+            if os.path.exists(output_file):
+                self.logger.info(f"Found translated output {output_file}; it can be written to Google Sheets "
+                                 f"without translating again.")
+                self.show_sheets_export()
 
     def browse_credentials(self):
         filepath = filedialog.askopenfilename(filetypes=[("JSON Files", "*.json")])
@@ -69,8 +144,92 @@ class TranslatorApp:
             self.credentials_entry.insert(0, filepath)
 
     def run_translation(self):
-        thread = threading.Thread(target=self.translate)
+        if self.service_var.get():
+            self.progress = RemoteProgress()
+            thread = threading.Thread(target=self.translate_via_service)
+        else:
+            self.progress = ProgressTracker()
+            thread = threading.Thread(target=self.translate)
         thread.start()
+        self.refresh_progress(thread)
+
+    def refresh_progress(self, thread):
+        # Samples the counters on the Tk thread; workers never touch the widgets
+        if self.progress is None:
+            return
+        snapshot = self.progress.snapshot(self.engine)
+        self.overall_bar.configure(maximum=max(1, snapshot["total"]), value=snapshot["done"])
+        for col, (bar, count) in self.column_bars.items():
+            done, total = snapshot["columns"].get(col, (0, 0))
+            bar.configure(maximum=max(1, total), value=done)
+            count.configure(text=f"{done}/{total}" if total else "")
+        if self.progress.started is not None:
+            self.status_label.configure(text=format_progress(snapshot))
+
+        if thread.is_alive():
+            self.root.after(int(DEFAULT_INTERVAL * 1000), self.refresh_progress, thread)
+        elif self.progress.started is None:
+            self.status_label.configure(text="Idle")
+
+    @staticmethod
+    def output_path(input_file):
+        # Parquet/Arrow inputs produce an output in the same format
+        base, ext = os.path.splitext(input_file)
+        return base + "_translated" + (ext if is_columnar(input_file) else ".xlsx")
+
+    def load_input(self, input_file, output_file, metrics):
+        # A re-run or resume of an unchanged input reuses its preprocessed Parquet copy
+        try:
+            return load_preprocessed(input_file, metrics, staging_path(output_file, "preprocessed"))
+        except Exception as e:
+            self.logger.error(f"Failed to load Excel: {e}")
+            return None
+
+    def load_routing(self):
+        # Optional extra backends, per-column routing and passthrough values, re-read on every run
+        if not os.path.exists(DEFAULT_ROUTING_PATH):
+            return [], {}, DEFAULT_TEXT_FILTER
+        try:
+            backends, columns = load_routing(DEFAULT_ROUTING_PATH, self.clients)
+            return backends, columns, TextFilter.from_config(DEFAULT_ROUTING_PATH)
+        except Exception as e:
+            self.logger.error(f"Failed to load backend config {DEFAULT_ROUTING_PATH}: {e}")
+            return None
+
+    def run_estimate(self):
+        threading.Thread(target=self.estimate).start()
+
+    def estimate(self):
+        # Dry run: what translating the selected file would take, without calling any API.
+        # Keys are not needed; latencies come from this file's last metrics report.
+        input_file = self.file_entry.get()
+        if not input_file:
+            messagebox.showerror("Error", "Select an Excel file first.")
+            return
+        threads = int(self.threads_entry.get())
+        output_file = self.output_path(input_file)
+        df = self.load_input(input_file, output_file, RunMetrics())
+        routing = self.load_routing()
+        if df is None or routing is None:
+            return
+        backends, columns, text_filter = routing
+
+        try:
+            deepl_translator = self.clients.deepl(self.deepl_key.get() or "estimate", DEFAULT_DEEPL_CONCURRENCY)
+            engine = AsyncTranslationEngine(deepseek_api_key=self.deepseek_key.get() or "estimate",
+                                            deepl_translator=deepl_translator, concurrency=threads,
+                                            clients=self.clients, backends=backends, text_filter=text_filter)
+            latencies = load_latencies(os.path.splitext(output_file)[0] + "_metrics.json")
+            plan = plan_translation(df, engine, column_routing(columns), cache=self.cache, latencies=latencies,
+                                    packed=self.packed_var.get())
+        except Exception as e:
+            self.logger.error(f"Estimate failed: {e}")
+            return
+
+        text = format_plan(plan)
+        for line in text.splitlines():
+            self.logger.info(line)
+        self.root.after(0, messagebox.showinfo, "Estimate", text)
 
     def translate(self):
         input_file = self.file_entry.get()
@@ -82,52 +241,105 @@ class TranslatorApp:
             messagebox.showerror("Error", "All fields are required.")
             return
 
-        try:
-            df = pd.read_excel(input_file)
-            df.columns = EXPECTED_COLUMNS
-        except Exception as e:
-            self.logger.error(f"Failed to load Excel: {e}")
+        output_file = self.output_path(input_file)
+        metrics = RunMetrics()
+        df = self.load_input(input_file, output_file, metrics)
+        if df is None:
             return
 
-        df['Model_Requirements'] = df['Model_Requirements'].fillna('N/A')
-        df['Scene'] = df['Scene'].fillna('N/A').astype(str)
-        df['Pets_Kids'] = df['Pets_Kids'].fillna('N/A').astype(str)
-        df['Shooting_Requirements'] = (
-            df['Comments'].fillna('').astype(str) + '\n' +
-            df['Requirements'].fillna('').astype(str)
-        )
-        df.drop(columns=['Comments', 'Requirements'], inplace=True)
-
         try:
-            deepl_translator = deepl.Translator(deepl_auth)
+            deepl_translator = self.clients.deepl(deepl_auth, DEFAULT_DEEPL_CONCURRENCY)
         except Exception as e:
             self.logger.error(f"DeepL initialization failed: {e}")
             return
 
-        for column in ['Product', 'Model_Requirements', 'Scene', 'Pets_Kids']:
-            df = translate_column_deepl(df, column, deepl_translator)
+        routing = self.load_routing()
+        if routing is None:
+            return
+        backends, columns, text_filter = routing
 
-        df = translate_column_deepseek(df, 'Shooting_Requirements', api_key=deepseek_auth, max_workers=threads)
+        # Rows unchanged since the last incremental run of this file keep their translations
+        manifest = IncrementalManifest(IncrementalManifest.path_for(output_file)) if self.incremental_var.get() else None
+        try:
+            fingerprints = manifest.fingerprints(df) if manifest is not None else None
+        except KeyError as e:
+            self.logger.error(f"Cannot translate only changed rows: {e.args[0]}")
+            return
+        # Finished translations are journaled as they complete so a crashed run can be resumed
+        journal = CheckpointJournal(CheckpointJournal.path_for(output_file), resume=self.resume_var.get())
+        engine = AsyncTranslationEngine(deepseek_api_key=deepseek_auth, deepl_translator=deepl_translator,
+                                        concurrency=threads, metrics=metrics, progress=self.progress,
+                                        clients=self.clients, backends=backends, text_filter=text_filter)
+        self.engine = engine
+        try:
+            df = translate_dataframe(df, engine, cache=self.cache, column_engines=column_routing(columns),
+                                     packed=self.packed_var.get(), journal=journal, previous=fingerprints)
+        finally:
+            engine.close()
+        if fingerprints is not None:
+            fingerprints.commit(df)
 
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce').dt.strftime('%m/%d/%Y')
+        with metrics.stage("postprocess"):
+            df = postprocess_dataframe(df)
 
-        output_file = os.path.splitext(input_file)[0] + "_translated.xlsx"
         try:
-            df.to_excel(output_file, index=False)
+            with metrics.stage("write_excel"):
+                write_table(df, output_file)
+            if not is_columnar(output_file):
+                # Parquet copy for re-opening the output later (see load_translated)
+                with metrics.stage("stage_write"):
+                    save_stage(df, staging_path(output_file, "translated"), output_file)
+            journal.discard()
+            if manifest is not None:
+                manifest.save()
             self.logger.info(f"Translation completed. Output saved to: {output_file}")
         except Exception as e:
+            journal.close()
             self.logger.error(f"Failed to save output: {e}")
 
         self.translated_df = df  # Store for export step
+        self.metrics_file = os.path.splitext(output_file)[0] + "_metrics.json"
+        self.metrics = metrics
+        self.save_metrics()
+        self.show_sheets_export()
+
+    def translate_via_service(self):
+        # Queues the workbook on the service and polls it; the service's job
+        # progress drives the same bars as a local run
+        input_file = self.file_entry.get()
+        if not input_file:
+            messagebox.showerror("Error", "Excel file is required.")
+            return
 
-        # Show Google Sheets inputs and button
-        self.sheet_id_label.grid(row=5, column=0, sticky='e', padx=5, pady=5)
-        self.sheet_id_entry.grid(row=5, column=1, padx=5)
-        self.credentials_label.grid(row=6, column=0, sticky='e', padx=5, pady=5)
-        self.credentials_entry.grid(row=6, column=1, padx=5)
-        self.credentials_browse.grid(row=6, column=2, padx=5)
-        self.write_button.grid(row=7, column=1, pady=15)
+        output_file = self.output_path(input_file)
+        client = ServiceClient(self.service_url)
+        try:
+            status = client.translate(input_file, output_file, packed=self.packed_var.get(),
+                                      incremental=self.incremental_var.get(), on_status=self.progress.update)
+            self.translated_df = load_translated(output_file)
+        except Exception as e:
+            self.logger.error(f"Translation via {self.service_url} failed: {e}")
+            return
+        self.logger.info(f"Service translated {status['rows']} rows. Output saved to: {output_file}")
+
+        # Run metrics stay with the job on the service
+        self.metrics = None
+        self.show_sheets_export()
+
+    def show_sheets_export(self):
+        self.sheet_id_label.grid(row=6, column=0, sticky='e', padx=5, pady=5)
+        self.sheet_id_entry.grid(row=6, column=1, padx=5)
+        self.credentials_label.grid(row=7, column=0, sticky='e', padx=5, pady=5)
+        self.credentials_entry.grid(row=7, column=1, padx=5)
+        self.credentials_browse.grid(row=7, column=2, padx=5)
+        self.write_button.grid(row=8, column=1, pady=15)
+
+    def save_metrics(self):
+        self.logger.info(self.metrics.summary())
+        try:
+            self.metrics.to_json(self.metrics_file)
+        except Exception as e:
+            self.logger.error(f"Failed to save run metrics: {e}")
 
     def run_write_to_google_sheets(self):
         sheet_id = self.sheet_id_entry.get()
@@ -137,8 +349,21 @@ class TranslatorApp:
             messagebox.showerror("Error", "Google Sheets spreadsheet ID and credentials path are required.")
             return
 
+        if self.translated_df is None:
+            output_file = self.output_path(self.file_entry.get())
+            try:
+                self.translated_df = load_translated(output_file)
+            except Exception as e:
+                self.logger.error(f"Failed to load translated output {output_file}: {e}")
+                return
+            self.logger.info(f"Loaded {len(self.translated_df)} translated rows from {output_file}.")
+
         try:
+            started = time.perf_counter()
             unmatched_rows = write_to_google_sheets(self.translated_df, sheet_id, credentials_path, self.logger)
+            if self.metrics is not None:
+                self.metrics.record_stage("sheets_write", time.perf_counter() - started)
+                self.save_metrics()
 
             if unmatched_rows:
                 unmatched_df = pd.DataFrame(unmatched_rows)
@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+from checkpoint import source_hash
+
+# Columns identifying a row across re-submissions of the same workbook
+DEFAULT_KEY_COLUMNS = ("ASIN", "Date")
+
+class IncrementalManifest:
+    """Sidecar of the translations in a finished output, keyed by row and column.
+
+    Each entry holds a fingerprint of the source text (and of the backend
+    that translated it) plus the translation. A later run of the edited
+    workbook restores every cell whose fingerprint is unchanged and only
+    translates new or edited cells. Rows are identified by DEFAULT_KEY_COLUMNS,
+    with a running number for repeated keys, so they may be reordered,
+    inserted or deleted between runs.
+    """
+
+    def __init__(self, path, key_columns=DEFAULT_KEY_COLUMNS, load=True):
+        self.path = path
+        self.key_columns = list(key_columns)
+        self.previous = {}
+        self.current = {}
+        self._seen = {}
+        if load:
+            self._load()
+
+    @staticmethod
+    def path_for(output_file):
+        return output_file + ".manifest.json"
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.getLogger().warning(f"Ignoring unreadable manifest {self.path}: {e}")
+            return
+        if data.get("key_columns") != self.key_columns:
+            logging.getLogger().warning(f"Manifest {self.path} uses other key columns, translating everything.")
+            return
+        self.previous = data.get("columns", {})
+        cells = sum(len(entries) for entries in self.previous.values())
+        logging.getLogger().info(f"Loaded {cells} translated cells from previous run manifest {self.path}.")
+
+    def fingerprints(self, df):
+        # Called once per DataFrame (or streamed chunk), in file order, before translating it
+        missing = [col for col in self.key_columns if col not in df.columns]
+        if missing:
+            raise KeyError(f"Key columns {missing} not found")
+        keys = []
+        for values in zip(*(df[col].astype(str) for col in self.key_columns)):
+            key = "\x1f".join(values)
+            occurrence = self._seen.get(key, 0)
+            self._seen[key] = occurrence + 1
+            keys.append(f"{key}\x1f{occurrence}")
+        return RowFingerprints(self, dict(zip(df.index, keys)))
+
+    def save(self):
+        # Only rows present in this run are kept; written atomically
+        data = {"key_columns": self.key_columns, "columns": self.current}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+class RowFingerprints:
+    """The row keys of one DataFrame, linking its cells to the manifest."""
+
+    def __init__(self, manifest, keys):
+        self.manifest = manifest
+        self.keys = keys
+        self._pending = {}
+        self._done = {}
+
+    def restore(self, df, col, mask, scope):
+        # Writes unchanged translations from the previous run into df and
+        # returns the mask of cells still to translate. scope identifies the
+        # backend and prompt, so rerouting a column translates it again.
+        previous = self.manifest.previous.get(col, {})
+        pending = {}
+        self._pending[col] = (scope, pending)
+        self._done[col] = set()
+        restored = []
+        for row, text in zip(df.index[mask], df.loc[mask, col]):
+            fingerprint = source_hash(f"{scope}\x1f{text}")
+            pending[row] = fingerprint
+            entry = previous.get(self.keys[row])
+            if entry is not None and entry[0] == fingerprint:
+                df.at[row, col] = entry[1]
+                restored.append(row)
+
+        self._done[col].update(restored)
+        if restored:
+            logging.getLogger().info(f"Reused {len(restored)} unchanged translations in column '{col}' "
+                                     f"from the previous run.")
+        return mask & ~df.index.isin(restored)
+
+    def mark_done(self, col, rows):
+        # Rows of col that got a translation this run (or from the journal). A
+        # translation may equal its source (brand names, glossary identities),
+        # so success is reported by the translator rather than guessed from the text.
+        self._done[col].update(rows)
+
+    def commit(self, df):
+        # Records the translated cells of df; failed cells are left out so the
+        # next run retries them
+        for col, (scope, pending) in self._pending.items():
+            current = self.manifest.current.setdefault(col, {})
+            for row in self._done[col]:
+                current[self.keys[row]] = [pending[row], df.at[row, col]]
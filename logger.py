@@ -1,16 +1,121 @@
 import logging
+import queue
+import re
+import threading
+import tkinter as tk
+
+DEFAULT_POLL_MS = 100
+DEFAULT_MAX_LINES = 5000
+DEFAULT_BATCH_LIMIT = 1000
+DEFAULT_MAX_PENDING = 20000
+
+# Below WARNING, per-request lines from these loggers are counted instead of
+# queued and shown as one line per status each time the queue is drained
+COALESCED_LOGGERS = ("httpx", "httpcore", "openai", "urllib3", "deepl")
+
+_HTTP_STATUS = re.compile(r'"HTTP/[\d.]+ (\d{3}[^"]*)"')
 
 class TextHandler(logging.Handler):
-    def __init__(self, text_widget):
+    """Logging handler for a Tk text widget that is safe to call from any thread.
+
+    emit() only formats the record and queues it, or counts it if it is
+    HTTP client chatter. The Tk main loop drains the queue every poll_ms
+    (via after), inserts the batch in one widget update and keeps at most
+    max_lines in the widget.
+    """
+
+    def __init__(self, text_widget, poll_ms=DEFAULT_POLL_MS, max_lines=DEFAULT_MAX_LINES,
+                 batch_limit=DEFAULT_BATCH_LIMIT, max_pending=DEFAULT_MAX_PENDING):
         super().__init__()
         self.text_widget = text_widget
+        self.poll_ms = poll_ms
+        self.max_lines = max_lines
+        self.batch_limit = batch_limit
+        self.queue = queue.Queue(maxsize=max_pending)
+        self._coalesced = {}
+        self._dropped = 0
+        self._pending_lock = threading.Lock()
+        self._after_id = None
+        # Must be constructed on the Tk thread, like the widget itself
+        self._schedule()
 
     def emit(self, record):
-        msg = self.format(record)
-        self.text_widget.configure(state='normal')
-        self.text_widget.insert('end', msg + '\n')
-        self.text_widget.configure(state='disabled')
-        self.text_widget.yview('end')
+        try:
+            key = self._coalesce_key(record)
+            msg = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        if key is not None:
+            with self._pending_lock:
+                entry = self._coalesced.setdefault(key, [msg, 0])
+                entry[1] += 1
+            return
+        try:
+            self.queue.put_nowait(msg)
+        except queue.Full:
+            with self._pending_lock:
+                self._dropped += 1
+
+    def _coalesce_key(self, record):
+        if record.levelno >= logging.WARNING or not record.name.startswith(COALESCED_LOGGERS):
+            return None
+        match = _HTTP_STATUS.search(record.getMessage())
+        return (record.name, match.group(1) if match else record.getMessage())
+
+    def _schedule(self):
+        try:
+            self._after_id = self.text_widget.after(self.poll_ms, self.pump)
+        except tk.TclError:
+            self._after_id = None  # widget destroyed
+
+    def _take_batch(self):
+        lines = []
+        for _ in range(self.batch_limit):
+            try:
+                lines.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+
+        with self._pending_lock:
+            coalesced, self._coalesced = self._coalesced, {}
+            dropped, self._dropped = self._dropped, 0
+
+        for msg, count in coalesced.values():
+            lines.append(msg if count == 1 else f"{msg} (x{count})")
+        if dropped:
+            lines.append(f"... {dropped} log lines dropped while the log view was busy")
+        return lines
+
+    def pump(self):
+        lines = self._take_batch()
+        if lines:
+            try:
+                self._insert(lines)
+            except tk.TclError:
+                return  # widget destroyed, stop polling
+        self._schedule()
+
+    def _insert(self, lines):
+        widget = self.text_widget
+        follow = widget.yview()[1] >= 0.999  # only auto-scroll if the user is at the bottom
+        widget.configure(state='normal')
+        widget.insert('end', "\n".join(lines) + '\n')
+        line_count = int(widget.index('end-1c').split('.')[0])
+        if line_count > self.max_lines:
+            widget.delete('1.0', f'{line_count - self.max_lines + 1}.0')
+        widget.configure(state='disabled')
+        if follow:
+            widget.yview('end')
+
+    def close(self):
+        if self._after_id is not None:
+            try:
+                self.text_widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        super().close()
 
 def setup_gui_logger(text_widget):
     handler = TextHandler(text_widget)
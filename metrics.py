@@ -0,0 +1,245 @@
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Recent samples kept per engine for percentiles; bucket counts cover every request
+_SAMPLE_WINDOW = 10000
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(math.ceil(pct / 100 * len(ordered))) - 1))]
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=_SAMPLE_WINDOW)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.samples.append(seconds)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def percentile(self, pct):
+        return percentile(list(self.samples), pct)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum_s": self.total,
+            "p50_s": self.percentile(50),
+            "p95_s": self.percentile(95),
+            "p99_s": self.percentile(99),
+        }
+
+class RunMetrics:
+    """Per-run instrumentation: stage spans, request latencies, retries, tokens and cache hits.
+
+    Engines and pipeline stages record into one instance, which is dumped as
+    JSON (to_json) or Prometheus text exposition (to_prometheus) after the run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.stages = {}
+        self.requests = {}
+        self.outcomes = {}
+        self.retries = {}
+        self.tokens = {}
+        self.cache = {"hits": 0, "misses": 0}
+        self.skipped_cells = 0
+        self.first_token = {}
+        self.token_rates = {}
+        self.hedges = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - started)
+
+    def record_stage(self, name, seconds):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"count": 0, "seconds": 0.0})
+            stage["count"] += 1
+            stage["seconds"] += seconds
+
+    def observe_request(self, engine, seconds, outcome="ok"):
+        with self._lock:
+            self.requests.setdefault(engine, LatencyHistogram()).observe(seconds)
+            key = (engine, outcome)
+            self.outcomes[key] = self.outcomes.get(key, 0) + 1
+
+    def record_retry(self, engine, kind):
+        with self._lock:
+            key = (engine, kind)
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    def record_tokens(self, engine, usage):
+        if usage is None:
+            return
+        with self._lock:
+            tokens = self.tokens.setdefault(engine, {"prompt": 0, "completion": 0})
+            tokens["prompt"] += getattr(usage, "prompt_tokens", 0) or 0
+            tokens["completion"] += getattr(usage, "completion_tokens", 0) or 0
+
+    def record_stream(self, engine, first_token_seconds, tokens, generation_seconds):
+        # Streamed requests: time to first token and output tokens/sec after it
+        with self._lock:
+            self.first_token.setdefault(engine, LatencyHistogram()).observe(first_token_seconds)
+            if tokens and generation_seconds > 0:
+                self.token_rates.setdefault(engine, deque(maxlen=_SAMPLE_WINDOW)).append(tokens / generation_seconds)
+
+    def record_hedge(self, engine, outcome):
+        # outcome is "sent" for every duplicate request and "won" when it beat the original
+        with self._lock:
+            key = (engine, outcome)
+            self.hedges[key] = self.hedges.get(key, 0) + 1
+
+    def record_cache(self, hits, misses):
+        with self._lock:
+            self.cache["hits"] += hits
+            self.cache["misses"] += misses
+
+    def record_skipped(self, cells):
+        with self._lock:
+            self.skipped_cells += cells
+
+    def request_count(self, engine=None):
+        with self._lock:
+            return sum(n for (name, _), n in self.outcomes.items() if engine is None or name == engine)
+
+    def retry_count(self):
+        with self._lock:
+            return sum(self.retries.values())
+
+    def latency_percentile(self, engine, pct):
+        with self._lock:
+            histogram = self.requests.get(engine)
+            return histogram.percentile(pct) if histogram else None
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "started": self.started,
+                "elapsed_s": time.time() - self.started,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "requests": {engine: histogram.to_dict() for engine, histogram in self.requests.items()},
+                "outcomes": {f"{engine}:{outcome}": n for (engine, outcome), n in self.outcomes.items()},
+                "retries": {f"{engine}:{kind}": n for (engine, kind), n in self.retries.items()},
+                "tokens": {engine: dict(tokens) for engine, tokens in self.tokens.items()},
+                "cache": dict(self.cache),
+                "skipped_cells": self.skipped_cells,
+                "first_token": {engine: histogram.to_dict() for engine, histogram in self.first_token.items()},
+                "tokens_per_s": {
+                    engine: {"p50": percentile(list(rates), 50), "p05": percentile(list(rates), 5)}
+                    for engine, rates in self.token_rates.items()
+                },
+                "hedges": {f"{engine}:{outcome}": n for (engine, outcome), n in self.hedges.items()},
+            }
+
+    def to_json(self, path=None):
+        text = json.dumps(self.to_dict(), indent=2)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def to_prometheus(self, path=None):
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            metric("translator_stage_seconds", "gauge", "Total wall time spent in each pipeline stage.")
+            for name, stage in self.stages.items():
+                lines.append(f'translator_stage_seconds{{stage="{name}"}} {stage["seconds"]:.6f}')
+
+            metric("translator_request_duration_seconds", "histogram", "API request latency per engine.")
+            for engine, histogram in self.requests.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'translator_request_duration_seconds_bucket{{engine="{engine}",le="{bound}"}} {cumulative}')
+                lines.append(f'translator_request_duration_seconds_bucket{{engine="{engine}",le="+Inf"}} {histogram.count}')
+                lines.append(f'translator_request_duration_seconds_sum{{engine="{engine}"}} {histogram.total:.6f}')
+                lines.append(f'translator_request_duration_seconds_count{{engine="{engine}"}} {histogram.count}')
+
+            metric("translator_requests_total", "counter", "API requests by engine and outcome.")
+            for (engine, outcome), n in self.outcomes.items():
+                lines.append(f'translator_requests_total{{engine="{engine}",outcome="{outcome}"}} {n}')
+
+            metric("translator_first_token_seconds", "histogram", "Time to first streamed token per engine.")
+            for engine, histogram in self.first_token.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'translator_first_token_seconds_bucket{{engine="{engine}",le="{bound}"}} {cumulative}')
+                lines.append(f'translator_first_token_seconds_bucket{{engine="{engine}",le="+Inf"}} {histogram.count}')
+                lines.append(f'translator_first_token_seconds_sum{{engine="{engine}"}} {histogram.total:.6f}')
+                lines.append(f'translator_first_token_seconds_count{{engine="{engine}"}} {histogram.count}')
+
+            metric("translator_hedged_requests_total", "counter", "Hedged duplicate requests sent, and how many won.")
+            for (engine, outcome), n in self.hedges.items():
+                lines.append(f'translator_hedged_requests_total{{engine="{engine}",outcome="{outcome}"}} {n}')
+
+            metric("translator_retries_total", "counter", "Retried API requests by engine and error kind.")
+            for (engine, kind), n in self.retries.items():
+                lines.append(f'translator_retries_total{{engine="{engine}",kind="{kind}"}} {n}')
+
+            metric("translator_tokens_total", "counter", "Tokens reported by the API.")
+            for engine, tokens in self.tokens.items():
+                for kind, n in tokens.items():
+                    lines.append(f'translator_tokens_total{{engine="{engine}",type="{kind}"}} {n}')
+
+            metric("translator_cache_lookups_total", "counter", "Translation cache lookups by result.")
+            lines.append(f'translator_cache_lookups_total{{result="hit"}} {self.cache["hits"]}')
+            lines.append(f'translator_cache_lookups_total{{result="miss"}} {self.cache["misses"]}')
+
+            metric("translator_skipped_cells_total", "counter", "Cells left as they are because they need no translation.")
+            lines.append(f"translator_skipped_cells_total {self.skipped_cells}")
+
+        text = "\n".join(lines) + "\n"
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def summary(self):
+        # One-line digest for the log
+        data = self.to_dict()
+        stages = ", ".join(f"{name} {stage['seconds']:.1f}s" for name, stage in data["stages"].items())
+        requests = ", ".join(
+            f"{engine} {r['count']} req (p50 {r['p50_s'] or 0:.2f}s, p99 {r['p99_s'] or 0:.2f}s)"
+            for engine, r in data["requests"].items()
+        )
+        retries = sum(data["retries"].values())
+        text = f"Stages: {stages or 'none'}. Requests: {requests or 'none'}. Retries: {retries}."
+        if data["first_token"]:
+            first_token = ", ".join(
+                f"{engine} p50 {r['p50_s'] or 0:.2f}s, p95 {r['p95_s'] or 0:.2f}s"
+                for engine, r in data["first_token"].items()
+            )
+            text += f" First token: {first_token}."
+        if data["hedges"]:
+            text += f" Hedged requests: {sum(n for key, n in data['hedges'].items() if key.endswith(':sent'))}."
+        return text
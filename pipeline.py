@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import time
+import pandas as pd
+from async_engine import run_sync, submit, DEFAULT_PACK_TOKEN_BUDGET
+from translator import translate_column_async, EXPECTED_COLUMNS
+from checkpoint import CheckpointJournal
+from incremental import IncrementalManifest
+from excel_stream import iter_excel_chunks, StreamingExcelWriter, DEFAULT_CHUNK_ROWS
+from columnar import read_table, write_table, is_columnar, staging_path, save_stage, load_stage
+
+# Which backend translates each column of the preprocessed sheet; a routing
+# config (backends.load_routing) can send columns elsewhere
+COLUMN_ENGINES = {
+    'Product': 'deepl',
+    'Model_Requirements': 'deepl',
+    'Scene': 'deepl',
+    'Pets_Kids': 'deepl',
+    'Shooting_Requirements': 'deepseek',
+}
+
+def column_routing(overrides=None):
+    return {**COLUMN_ENGINES, **(overrides or {})}
+
+def preprocess_dataframe(df):
+    df['Model_Requirements'] = df['Model_Requirements'].fillna('N/A')
+    df['Scene'] = df['Scene'].fillna('N/A').astype(str)
+    df['Pets_Kids'] = df['Pets_Kids'].fillna('N/A').astype(str)
+    df['Shooting_Requirements'] = (
+        df['Comments'].fillna('').astype(str) + '\n' +
+        df['Requirements'].fillna('').astype(str)
+    )
+    df.drop(columns=['Comments', 'Requirements'], inplace=True)
+    return df
+
+def postprocess_dataframe(df):
+    # Format the Date column to avoid time component
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'], errors='coerce').dt.strftime('%m/%d/%Y')
+    return df
+
+async def translate_dataframe_async(df, engine, cache=None, column_engines=None, normalize_duplicates=False,
+                                    packed=False, pack_token_budget=DEFAULT_PACK_TOKEN_BUDGET, journal=None,
+                                    previous=None):
+    # Every column is scheduled at once on the shared loop; the engine's
+    # per-engine limits decide how much DeepL and DeepSeek work is in flight,
+    # so the run takes about as long as the slowest engine rather than the sum.
+    # Packing options only affect backends that batch by tokens (OpenAI-compatible ones)
+    column_engines = column_engines or COLUMN_ENGINES
+    await asyncio.gather(*(
+        translate_column_async(df, col, engine_name, engine, cache, normalize_duplicates, journal, previous,
+                               packed=packed, pack_token_budget=pack_token_budget)
+        for col, engine_name in column_engines.items()
+    ))
+    return df
+
+def translate_dataframe(df, engine, cache=None, column_engines=None, normalize_duplicates=False,
+                        packed=False, pack_token_budget=DEFAULT_PACK_TOKEN_BUDGET, journal=None, previous=None):
+    logger = logging.getLogger()
+    started = time.perf_counter()
+
+    with engine.metrics.stage("translate"):
+        df = run_sync(translate_dataframe_async(
+            df, engine, cache, column_engines, normalize_duplicates, packed, pack_token_budget, journal, previous
+        ))
+
+    logger.info(f"Translated all columns in {time.perf_counter() - started:.1f}s.")
+    return df
+
+def translate_workbook_streaming(input_file, output_file, engine, cache=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                                 normalize_duplicates=False, packed=False,
+                                 pack_token_budget=DEFAULT_PACK_TOKEN_BUDGET, journal=None, column_engines=None,
+                                 manifest=None):
+    # Reads, translates and writes the workbook chunk by chunk. The next chunk is
+    # parsed while the current one is being translated, so at most two chunks
+    # are in memory regardless of file size.
+    logger = logging.getLogger()
+    started = time.perf_counter()
+    writer = StreamingExcelWriter(output_file)
+    in_flight = None
+
+    def finish(future, fingerprints):
+        chunk = future.result()
+        if fingerprints is not None:
+            fingerprints.commit(chunk)
+        chunk = postprocess_dataframe(chunk)
+        with engine.metrics.stage("write_excel"):
+            writer.append(chunk)
+        logger.info(f"Wrote {writer.rows_written} translated rows to {output_file}.")
+
+    for chunk in iter_excel_chunks(input_file, chunk_rows):
+        with engine.metrics.stage("preprocess"):
+            chunk = preprocess_dataframe(chunk)
+        fingerprints = manifest.fingerprints(chunk) if manifest is not None else None
+        future = submit(translate_dataframe_async(
+            chunk, engine, cache, column_engines, normalize_duplicates, packed, pack_token_budget, journal,
+            fingerprints
+        ))
+        if in_flight is not None:
+            finish(*in_flight)
+        in_flight = (future, fingerprints)
+
+    if in_flight is not None:
+        finish(*in_flight)
+    with engine.metrics.stage("write_excel"):
+        writer.close()
+
+    logger.info(f"Streamed {writer.rows_written} rows in {time.perf_counter() - started:.1f}s.")
+    return writer.rows_written
+
+def load_preprocessed(input_file, metrics, staged_input=None):
+    # The preprocessed frame of a workbook, from its staged Parquet copy when
+    # staged_input is given and still matches the input
+    logger = logging.getLogger()
+    df = load_stage(staged_input, input_file) if staged_input else None
+    if df is not None:
+        logger.info(f"Loaded {len(df)} preprocessed rows from {staged_input}.")
+        return df
+
+    with metrics.stage("read_excel"):
+        df = read_table(input_file)
+    logger.info(f"Loaded worksheet with {len(df)} rows.")
+    df.columns = EXPECTED_COLUMNS
+
+    with metrics.stage("preprocess"):
+        df = preprocess_dataframe(df)
+    if staged_input:
+        with metrics.stage("stage_write"):
+            save_stage(df, staged_input, input_file)
+    return df
+
+def translate_workbook(input_file, output_file, engine, cache=None, normalize_duplicates=False, packed=False,
+                       pack_token_budget=DEFAULT_PACK_TOKEN_BUDGET, journal=None, column_engines=None, manifest=None,
+                       stage=False):
+    # Loads the whole workbook (xlsx, Parquet or Arrow), translates it and writes
+    # the result in the format of output_file; returns the row count. With stage,
+    # the preprocessed and translated frames are also kept as Parquet next to the
+    # output, so a re-run or resume of an unchanged input skips parsing it again.
+    metrics = engine.metrics
+    df = load_preprocessed(input_file, metrics, staging_path(output_file, "preprocessed") if stage else None)
+
+    fingerprints = manifest.fingerprints(df) if manifest is not None else None
+    df = translate_dataframe(df, engine, cache=cache, column_engines=column_engines,
+                             normalize_duplicates=normalize_duplicates, packed=packed,
+                             pack_token_budget=pack_token_budget, journal=journal, previous=fingerprints)
+    if fingerprints is not None:
+        fingerprints.commit(df)
+
+    with metrics.stage("postprocess"):
+        df = postprocess_dataframe(df)
+    with metrics.stage("write_excel"):
+        write_table(df, output_file)
+    if stage and not is_columnar(output_file):
+        with metrics.stage("stage_write"):
+            save_stage(df, staging_path(output_file, "translated"), output_file)
+    return len(df)
+
+def process_workbook(input_file, output_file, engine, cache=None, resume=False, chunk_rows=0,
+                     normalize_duplicates=False, packed=False, pack_token_budget=DEFAULT_PACK_TOKEN_BUDGET,
+                     column_engines=None, incremental=False, stage=False, manifest_file=None):
+    # One workbook end to end, journaled so an interrupted run can resume. Streams
+    # in chunks of chunk_rows when set. Returns the number of rows written; the
+    # journal is kept if anything fails. With incremental, cells unchanged since
+    # the last incremental run of this output are taken from its manifest (kept next
+    # to the output unless manifest_file says otherwise). Streaming only handles
+    # xlsx; Parquet/Arrow inputs and outputs are read and written whole.
+    journal = CheckpointJournal(CheckpointJournal.path_for(output_file), resume=resume)
+    if incremental:
+        manifest = IncrementalManifest(manifest_file or IncrementalManifest.path_for(output_file))
+    else:
+        manifest = None
+    try:
+        if chunk_rows and not is_columnar(input_file) and not is_columnar(output_file):
+            rows = translate_workbook_streaming(
+                input_file, output_file, engine, cache=cache, chunk_rows=chunk_rows,
+                normalize_duplicates=normalize_duplicates, packed=packed,
+                pack_token_budget=pack_token_budget, journal=journal, column_engines=column_engines,
+                manifest=manifest
+            )
+        else:
+            rows = translate_workbook(
+                input_file, output_file, engine, cache=cache, normalize_duplicates=normalize_duplicates,
+                packed=packed, pack_token_budget=pack_token_budget, journal=journal,
+                column_engines=column_engines, manifest=manifest, stage=stage
+            )
+    except BaseException:
+        journal.close()
+        raise
+    journal.discard()
+    if manifest is not None:
+        manifest.save()
+    logging.getLogger().info(f"Translation completed. Output saved to: {output_file}")
+    return rows
@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+from backends import split_segments, DEFAULT_PACK_TOKEN_BUDGET
+from progress import format_duration
+from translator import dedupe_texts
+
+# Mean request latency assumed for a backend with no measurements yet (seconds)
+DEFAULT_LATENCY = {"deepl": 0.8, "deepseek": 3.0, "glossary": 0.0}
+FALLBACK_LATENCY = 2.0
+
+def load_latencies(metrics_file):
+    # Mean request latency per engine from a previous run's metrics JSON
+    if not metrics_file or not os.path.exists(metrics_file):
+        return {}
+    try:
+        with open(metrics_file, encoding="utf-8") as f:
+            requests = json.load(f).get("requests", {})
+    except (OSError, ValueError) as e:
+        logging.getLogger().warning(f"Could not read latencies from {metrics_file}: {e}")
+        return {}
+    return {engine: r["sum_s"] / r["count"] for engine, r in requests.items() if r.get("count")}
+
+def _plan_column(df, col, backend, engine, cache, normalize_duplicates, options):
+    text = df[col].fillna("").astype(str)
+    if engine.text_filter is not None:
+        mask = engine.text_filter.needs_translation(text)
+    else:
+        mask = text != ""
+    texts = text[mask].tolist()
+    unique_texts, _ = dedupe_texts(texts, normalize=normalize_duplicates)
+
+    cached = 0
+    if cache is not None and backend.cacheable and unique_texts:
+        hits = cache.get_many(*backend.cache_scope(), unique_texts)
+        cached = len(hits)
+        unique_texts = [t for t in unique_texts if t not in hits]
+
+    plans = [_plan_requests(col, backend, unique_texts, options, cells=int(mask.size), to_translate=len(texts),
+                            cached=cached)]
+    # What a glossary does not contain goes on to its fallback backend, uncached
+    seen = {backend.name}
+    while backend.fallback in engine.backends and backend.fallback not in seen and unique_texts:
+        unique_texts = backend.plan_misses(unique_texts)
+        backend = engine.backend(backend.fallback)
+        seen.add(backend.name)
+        if unique_texts:
+            plans.append(_plan_requests(col, backend, unique_texts, options, cells=int(mask.size),
+                                        to_translate=len(unique_texts), cached=0, fallback=True))
+    return plans
+
+def _plan_requests(col, backend, texts, options, cells, to_translate, cached, fallback=False):
+    # Same request shapes the engine will produce: long texts split, then batched
+    groups = None
+    if backend.segment_tokens:
+        splits = [split_segments(t, backend.segment_tokens)[0] for t in texts]
+        texts = [segment for segments in splits for segment in segments]
+        groups = [i for i, segments in enumerate(splits) for _ in segments]
+    batches = backend.plan_batches(texts, groups=groups, **options)
+    return {
+        "column": col,
+        "engine": backend.name,
+        "fallback": fallback,
+        "cells": cells,
+        "to_translate": to_translate,
+        "cached": cached,
+        "requests": len(batches),
+        "tokens": sum(backend.request_tokens(texts[start:end]) for start, end in batches),
+        "characters": sum(len(t) for t in texts),
+        "cost": backend.estimate_cost(texts),
+    }
+
+def plan_translation(df, engine, column_engines, cache=None, latencies=None, normalize_duplicates=False,
+                     packed=False, pack_token_budget=DEFAULT_PACK_TOKEN_BUDGET):
+    """Estimate the work of translating a preprocessed DataFrame without calling any API.
+
+    Returns per-column counts (cells, cells to translate after filtering,
+    unique cache misses as requests, tokens, characters, cost) and a
+    per-engine wall-time estimate from the configured concurrency and rate
+    limits and the measured mean latency (latencies, see load_latencies).
+    Texts a glossary does not contain are counted again, as a fallback row,
+    against the backend they fall back to. Columns run concurrently, so the
+    run takes about as long as the slowest engine.
+    """
+    latencies = latencies or {}
+    options = {"packed": packed, "pack_token_budget": pack_token_budget}
+    columns = []
+    for col, engine_name in column_engines.items():
+        if col not in df.columns or engine_name not in engine.backends:
+            continue
+        columns.extend(_plan_column(df, col, engine.backend(engine_name), engine, cache, normalize_duplicates,
+                                    options))
+
+    engines = {}
+    for column in columns:
+        totals = engines.setdefault(column["engine"], {"requests": 0, "tokens": 0, "cost": 0.0})
+        for key in totals:
+            totals[key] += column[key]
+    for name, totals in engines.items():
+        backend = engine.backend(name)
+        # Configured backends fall back to the default of their type (a glossary named "local")
+        latency = latencies.get(name, DEFAULT_LATENCY.get(name, DEFAULT_LATENCY.get(type(backend).name,
+                                                                                    FALLBACK_LATENCY)))
+        # Bounded by whichever is tighter: in-flight requests, requests/sec or tokens/min
+        seconds = totals["requests"] * latency / max(1, backend.concurrency)
+        if backend.requests_per_second:
+            seconds = max(seconds, totals["requests"] / backend.requests_per_second)
+        if backend.tokens_per_minute:
+            seconds = max(seconds, totals["tokens"] / backend.tokens_per_minute * 60)
+        # The last wave of requests still takes a full request latency
+        totals.update(latency_s=latency, concurrency=backend.concurrency,
+                      seconds=seconds + latency if totals["requests"] else 0.0, measured=name in latencies)
+
+    return {
+        "rows": len(df),
+        "columns": columns,
+        "engines": engines,
+        "requests": sum(e["requests"] for e in engines.values()),
+        "cost": sum(e["cost"] for e in engines.values()),
+        "seconds": max((e["seconds"] for e in engines.values()), default=0.0),
+    }
+
+def format_plan(plan):
+    lines = [f"Plan for {plan['rows']} rows:"]
+    for c in plan["columns"]:
+        if c["fallback"]:
+            lines.append(f"  {'  fallback':<22} {c['engine']:<9} {c['to_translate']:>7} texts not in the glossary, "
+                         f"{c['requests']} requests, ~{c['tokens']} tokens, {c['characters']} chars, "
+                         f"~${c['cost']:.2f}")
+            continue
+        lines.append(
+            f"  {c['column']:<22} {c['engine']:<9} {c['to_translate']:>7}/{c['cells']} cells, "
+            f"{c['cached']} cached, {c['requests']} requests, ~{c['tokens']} tokens, "
+            f"{c['characters']} chars, ~${c['cost']:.2f}"
+        )
+    for name, e in plan["engines"].items():
+        source = "measured" if e["measured"] else "assumed"
+        lines.append(
+            f"  {name}: {e['requests']} requests at concurrency {e['concurrency']}, "
+            f"{e['latency_s']:.2f}s {source} mean latency -> ~{format_duration(e['seconds'])}"
+        )
+    lines.append(f"Total: {plan['requests']} requests, ~${plan['cost']:.2f}, "
+                 f"estimated wall time ~{format_duration(plan['seconds'])}.")
+    return "\n".join(lines)
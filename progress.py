@@ -0,0 +1,128 @@
+import sys
+import threading
+import time
+
+DEFAULT_INTERVAL = 0.5
+
+class ProgressTracker:
+    """Completed/total cells per column for a run.
+
+    Counters are plain integers bumped from the event loop thread as
+    translations land (no locks, no callbacks); the GUI or the headless
+    reporter samples them with snapshot() at a fixed rate and derives
+    request rate, in-flight count, retries and ETA at that point.
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.started = None
+        self._last_sample = None
+        self._request_rate = 0.0
+
+    def add_cells(self, col, total, done=0):
+        # Totals accumulate, so streamed chunks extend the same column
+        if self.started is None:
+            self.started = time.monotonic()
+        counts = self.columns.setdefault(col, [0, 0])
+        counts[0] += done
+        counts[1] += total
+
+    def advance(self, col, cells=1):
+        self.columns[col][0] += cells
+
+    def snapshot(self, engine=None):
+        now = time.monotonic()
+        columns = {col: (done, total) for col, (done, total) in list(self.columns.items())}
+        done = sum(d for d, _ in columns.values())
+        total = sum(t for _, t in columns.values())
+        elapsed = now - self.started if self.started is not None else 0.0
+
+        requests = retries = in_flight = 0
+        if engine is not None:
+            requests = engine.metrics.request_count()
+            retries = engine.metrics.retry_count()
+            in_flight = sum(limiter.in_flight for limiter in engine.limiters.values())
+
+        # Request rate is smoothed between samples; the cell rate is averaged over
+        # the whole run because DeepL results land a whole column at a time
+        if self._last_sample is not None:
+            last_time, last_requests = self._last_sample
+            if now > last_time:
+                rate = (requests - last_requests) / (now - last_time)
+                self._request_rate = 0.7 * self._request_rate + 0.3 * rate
+        self._last_sample = (now, requests)
+
+        cell_rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / cell_rate if cell_rate > 0 and total > done else None
+        return {
+            "columns": columns,
+            "done": done,
+            "total": total,
+            "elapsed_s": elapsed,
+            "cells_per_s": cell_rate,
+            "requests": requests,
+            "requests_per_s": self._request_rate,
+            "in_flight": in_flight,
+            "retries": retries,
+            "eta_s": eta,
+        }
+
+def format_duration(seconds):
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+def format_progress(snapshot):
+    total = snapshot["total"]
+    pct = snapshot["done"] / total if total else 0.0
+    return (f"{snapshot['done']}/{total} cells ({pct:.0%}) | {snapshot['requests_per_s']:.1f} req/s | "
+            f"{snapshot['in_flight']} in flight | {snapshot['retries']} retries | "
+            f"elapsed {format_duration(snapshot['elapsed_s'])} | ETA {format_duration(snapshot['eta_s'])}")
+
+class ProgressPrinter:
+    # Rewrites one status line on a terminal from a background thread until
+    # stopped; non-terminal output (log files, CI) gets a line every 20 intervals
+    def __init__(self, tracker, engine=None, interval=DEFAULT_INTERVAL, stream=None):
+        self.tracker = tracker
+        self.engine = engine
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _write(self, final=False):
+        line = format_progress(self.tracker.snapshot(self.engine))
+        if self.stream.isatty():
+            self.stream.write("\r\033[K" + line + ("\n" if final else ""))
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def _run(self):
+        ticks = 0
+        tty = self.stream.isatty()
+        while not self._stop.wait(self.interval):
+            ticks += 1
+            if self.tracker.started is not None and (tty or ticks % 20 == 0):
+                self._write()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.tracker.started is not None:
+            self._write(final=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,66 @@
+import hashlib
+import json
+import math
+import re
+
+TARGET_LANG = "EN-US"
+
+DEEPSEEK_MODEL = "deepseek-chat"
+
+DEEPSEEK_SYSTEM_PROMPT = (
+    "You are a professional, accurate, and natural translator. "
+    "Do not add any introductions, commentary, or explanations. Only output the translated English text."
+)
+
+DEEPSEEK_USER_TEMPLATE = "Translate this Chinese text to fluent English:\n\n{text}"
+
+DEEPSEEK_PACKED_SYSTEM_PROMPT = (
+    "You are a professional, accurate, and natural translator. "
+    "You receive a JSON object with a list of numbered Chinese segments. Translate every segment to fluent English "
+    "independently and reply with JSON only, in the form "
+    '{"translations": [{"id": <same id>, "text": "<English translation>"}]}, '
+    "with exactly one entry per input segment. Do not merge, split, skip or comment on segments."
+)
+
+DEEPSEEK_PACKED_USER_TEMPLATE = "Translate these segments:\n\n{payload}"
+
+# Rough token estimate: one token per CJK character, ~4 characters per token otherwise.
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+def estimate_tokens(text):
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4) + 1
+
+def build_packed_payload(texts):
+    segments = [{"id": i, "text": text} for i, text in enumerate(texts)]
+    return json.dumps({"segments": segments}, ensure_ascii=False)
+
+def parse_packed_response(content, expected_count):
+    # Raises ValueError unless the reply holds exactly one translation per segment id.
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.strip("`")
+        content = content[content.find("\n") + 1:] if content.lower().startswith("json") else content
+
+    try:
+        entries = json.loads(content)["translations"]
+        results = {int(entry["id"]): str(entry["text"]).strip() for entry in entries}
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Unparseable packed response: {e}")
+
+    if len(entries) != expected_count or sorted(results) != list(range(expected_count)):
+        raise ValueError(f"Packed response has {len(entries)} segments, expected {expected_count}")
+    return [results[i] for i in range(expected_count)]
+
+def prompt_version(*parts):
+    # Short fingerprint of everything that shapes the model output, so cached
+    # translations are keyed to the prompt that produced them.
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:12]
+
+DEEPSEEK_PROMPT_VERSION = prompt_version(
+    DEEPSEEK_MODEL, DEEPSEEK_SYSTEM_PROMPT, DEEPSEEK_USER_TEMPLATE,
+    DEEPSEEK_PACKED_SYSTEM_PROMPT, DEEPSEEK_PACKED_USER_TEMPLATE
+)
+
+# DeepL has no prompt; bump this if glossary or formality options are added.
+DEEPL_PROMPT_VERSION = "deepl-1"
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import random
+import time
+import deepl
+import openai
+
+logger = logging.getLogger()
+
+RATE_LIMITED = "rate_limited"
+RETRYABLE = "retryable"
+FATAL = "fatal"
+
+_RETRYABLE_STATUS = {408, 409, 500, 502, 503, 504}
+
+def _retry_after(response):
+    # Retry-After is either seconds or an HTTP date; only the seconds form is used by these APIs
+    if response is None:
+        return None
+    try:
+        return max(0.0, float(response.headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+def classify_error(e):
+    """Return (kind, retry_after_seconds) for an exception raised by an API call."""
+    if isinstance(e, openai.RateLimitError):
+        return RATE_LIMITED, _retry_after(getattr(e, "response", None))
+    if isinstance(e, (openai.APIConnectionError, openai.APITimeoutError)):
+        return RETRYABLE, None
+    if isinstance(e, openai.APIStatusError):
+        status = e.status_code
+        return (RETRYABLE if status in _RETRYABLE_STATUS or status >= 500 else FATAL), None
+
+    if isinstance(e, deepl.TooManyRequestsException):
+        return RATE_LIMITED, None
+    if isinstance(e, (deepl.AuthorizationException, deepl.QuotaExceededException)):
+        return FATAL, None
+    if isinstance(e, deepl.ConnectionException):
+        return RETRYABLE, None
+    if isinstance(e, deepl.DeepLException):
+        status = e.http_status_code
+        return (RETRYABLE if e.should_retry or (status is not None and status >= 500) else FATAL), None
+
+    if isinstance(e, (asyncio.TimeoutError, ConnectionError)):
+        return RETRYABLE, None
+    return FATAL, None
+
+def is_account_error(e):
+    # Bad credentials or an exhausted quota fail every request the same way
+    return isinstance(e, (openai.AuthenticationError, openai.PermissionDeniedError,
+                          deepl.AuthorizationException, deepl.QuotaExceededException))
+
+def is_transient(e):
+    # Outages and rate limits: sending the same texts in smaller requests only adds load
+    return classify_error(e)[0] != FATAL
+
+class TokenBucket:
+    def __init__(self, rate_per_second, capacity=None):
+        self.rate = rate_per_second
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_second)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self, amount=1):
+        # Reserves immediately and sleeps off any deficit, so waiters are served in arrival order
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+class AdaptiveRateLimiter:
+    """Shared per-engine limiter: request and token buckets plus an AIMD concurrency cap.
+
+    Every successful call grows the cap by one per full window of successes;
+    a rate-limited call halves it (at most once per cooldown) and pauses all
+    callers for the server's Retry-After.
+    """
+
+    def __init__(self, name, max_concurrency, requests_per_second=None, tokens_per_minute=None,
+                 min_concurrency=1, decrease_cooldown=1.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self.requests_per_second = requests_per_second
+        self.tokens_per_minute = tokens_per_minute
+        self.decrease_cooldown = decrease_cooldown
+        self.request_bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.token_bucket = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute) if tokens_per_minute else None
+        self.rate_limited_count = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._condition = None
+
+    def _get_condition(self):
+        # Created on first use so it binds to the loop that runs the requests
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self, tokens=0):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+        try:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            if self.request_bucket:
+                await self.request_bucket.acquire(1)
+            if self.token_bucket and tokens:
+                await self.token_bucket.acquire(tokens)
+        except BaseException:
+            await self.release()
+            raise
+
+    async def release(self):
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def on_success(self):
+        self._successes += 1
+        if self.limit < self.max_concurrency and self._successes >= self.limit:
+            self._successes = 0
+            self.limit += 1
+            if self.limit == self.max_concurrency or self.limit % 10 == 0:
+                logger.info(f"Rate limiter {self.describe()}")
+
+    def on_rate_limited(self, retry_after=None):
+        now = time.monotonic()
+        self.rate_limited_count += 1
+        if retry_after:
+            self._paused_until = max(self._paused_until, now + retry_after)
+
+        if now - self._last_decrease >= self.decrease_cooldown:
+            self._last_decrease = now
+            self._successes = 0
+            previous = self.limit
+            self.limit = max(self.min_concurrency, self.limit // 2)
+            pause = f", pausing {retry_after:.1f}s" if retry_after else ""
+            logger.warning(f"{self.name} rate limited: concurrency {previous} -> {self.limit}{pause}.")
+
+    def describe(self):
+        parts = [f"{self.name}: concurrency {self.limit}/{self.max_concurrency}"]
+        if self.requests_per_second:
+            parts.append(f"{self.requests_per_second} req/s")
+        if self.tokens_per_minute:
+            parts.append(f"{self.tokens_per_minute} tokens/min")
+        return ", ".join(parts)
+
+async def call_with_limits(limiter, func, tokens=0, retries=5, base_delay=1.0, max_delay=30.0, metrics=None,
+                           engine=None):
+    engine = engine or limiter.name.lower()
+    for attempt in range(retries):
+        await limiter.acquire(tokens)
+        started = time.perf_counter()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            # e.g. the losing half of a hedged pair; the slot must still be freed
+            await limiter.release()
+            raise
+        except Exception as e:
+            await limiter.release()
+            kind, retry_after = classify_error(e)
+            if metrics is not None:
+                metrics.observe_request(engine, time.perf_counter() - started, kind)
+            if kind == RATE_LIMITED:
+                limiter.on_rate_limited(retry_after)
+            if kind == FATAL or attempt == retries - 1:
+                raise e
+            if metrics is not None:
+                metrics.record_retry(engine, kind)
+            # Full jitter keeps workers that failed together from retrying together
+            delay = retry_after if retry_after else random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            await asyncio.sleep(delay)
+            continue
+
+        await limiter.release()
+        limiter.on_success()
+        if metrics is not None:
+            metrics.observe_request(engine, time.perf_counter() - started)
+        return result
@@ -0,0 +1,432 @@
+"""Local translation service: one warm engine, a priority queue of workbook jobs.
+
+    python service.py --port 8765 --workers 2 --concurrency 200
+
+API clients, the translation cache and the rate limiters are created once
+and shared by every job, so jobs from several operators draw from one
+concurrency and rate budget instead of competing for the API quota. API
+keys are read from DEEPL_AUTH_KEY and DEEPSEEK_API_KEY on the service side.
+
+    POST   /jobs?name=<file>&priority=<n>&packed=1   body: the workbook -> {"id": ...}
+           &incremental=1&key=<k>                    only translate rows changed since the last job with key k
+    GET    /jobs                                     all jobs
+    GET    /jobs/<id>                                status and live progress
+    GET    /jobs/<id>/result                         the translated workbook
+    DELETE /jobs/<id>                                cancel a queued job
+
+Higher priorities run first; equal priorities run in submission order.
+Each job gets its own directory, so incremental manifests are kept apart in
+<workdir>/manifests, one per key (the file name unless the client sends one).
+ServiceClient is the matching client used by the GUI and the headless script.
+"""
+import argparse
+import heapq
+import itertools
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from async_engine import DEFAULT_CONCURRENCY, DEFAULT_DEEPL_CONCURRENCY
+from backends import DEFAULT_ROUTING_PATH
+from checkpoint import source_hash
+from columnar import is_columnar
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_SERVICE_URL = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+DEFAULT_WORKDIR = "translation_service"
+DEFAULT_WORKERS = 2
+# Finished jobs (and their files) are kept this long for polling and download
+DEFAULT_RETENTION_S = 24 * 3600
+
+logger = logging.getLogger()
+
+class Job:
+    def __init__(self, name, priority, options, workdir):
+        self.id = uuid.uuid4().hex[:12]
+        name = os.path.basename(name)
+        # "." and ".." survive basename but would make input_file a directory
+        self.name = name if name not in ("", ".", "..") else "workbook.xlsx"
+        self.priority = priority
+        self.options = options
+        self.dir = os.path.join(workdir, self.id)
+        # Outlives the job directory so the next job with the same key can reuse it
+        key = options.get("key") or self.name
+        self.manifest_file = os.path.join(workdir, "manifests", f"{source_hash(key)}.manifest.json")
+        self.input_file = os.path.join(self.dir, self.name)
+        base, ext = os.path.splitext(self.name)
+        self.output_file = os.path.join(self.dir, base + "_translated" + (ext if is_columnar(self.name) else ".xlsx"))
+        self.status = "queued"
+        self.error = None
+        self.rows = None
+        self.engine = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def to_dict(self):
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "priority": self.priority,
+            "options": self.options,
+            "status": self.status,
+            "error": self.error,
+            "rows": self.rows,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if self.engine is not None:
+            data["progress"] = self.engine.progress.snapshot(self.engine)
+        return data
+
+class TranslationService:
+    """Runs queued jobs on `workers` threads against one shared engine and cache."""
+
+    def __init__(self, engine, cache, workdir=DEFAULT_WORKDIR, workers=DEFAULT_WORKERS, column_engines=None,
+                 retention_s=DEFAULT_RETENTION_S):
+        self.engine = engine
+        self.cache = cache
+        self.workdir = workdir
+        self.column_engines = column_engines
+        self.retention_s = retention_s
+        self.jobs = {}
+        self._queue = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._stopping = False
+        os.makedirs(os.path.join(workdir, "manifests"), exist_ok=True)
+        self._threads = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, name, data, priority=0, options=None):
+        job = Job(name, priority, options or {}, self.workdir)
+        os.makedirs(job.dir, exist_ok=True)
+        with open(job.input_file, "wb") as f:
+            f.write(data)
+        with self._condition:
+            self._expire()
+            self.jobs[job.id] = job
+            heapq.heappush(self._queue, (-priority, next(self._order), job.id))
+            self._condition.notify()
+        logger.info(f"Queued job {job.id} ({job.name}, priority {priority}).")
+        return job
+
+    def cancel(self, job_id):
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if job is None or job.status != "queued":
+                return False
+            job.status = "cancelled"
+            job.finished = time.time()
+        return True
+
+    def _expire(self):
+        # Drops finished jobs past the retention period; called with the lock held
+        cutoff = time.time() - self.retention_s
+        for job_id, job in list(self.jobs.items()):
+            if job.finished is not None and job.finished < cutoff:
+                shutil.rmtree(job.dir, ignore_errors=True)
+                del self.jobs[job_id]
+
+    def _next_job(self):
+        with self._condition:
+            while True:
+                while not self._queue and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return None
+                _, _, job_id = heapq.heappop(self._queue)
+                job = self.jobs.get(job_id)
+                if job is not None and job.status == "queued":
+                    job.status = "running"
+                    job.started = time.time()
+                    return job
+
+    def _work(self):
+        from pipeline import process_workbook
+
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            job.engine = self.engine.fork()
+            logger.info(f"Started job {job.id} ({job.name}).")
+            try:
+                job.rows = process_workbook(
+                    job.input_file, job.output_file, job.engine, cache=self.cache,
+                    packed=job.options.get("packed", False), incremental=job.options.get("incremental", False),
+                    column_engines=self.column_engines, manifest_file=job.manifest_file
+                )
+                job.status = "done"
+                logger.info(f"Finished job {job.id}: {job.rows} rows in {time.time() - job.started:.1f}s.")
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                logger.error(f"Job {job.id} failed: {e}")
+            job.finished = time.time()
+            try:
+                job.engine.metrics.to_json(os.path.join(job.dir, "metrics.json"))
+            except Exception as e:
+                logger.error(f"Failed to save metrics for job {job.id}: {e}")
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self):
+        url = urllib.parse.urlsplit(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        return parts, dict(urllib.parse.parse_qsl(url.query))
+
+    def _job(self, job_id):
+        job = self.server.service.jobs.get(job_id)
+        if job is None:
+            self._send_json(404, {"error": f"Unknown job {job_id}"})
+        return job
+
+    def do_POST(self):
+        parts, query = self._route()
+        if parts != ["jobs"]:
+            return self._send_json(404, {"error": f"Unknown path {self.path}"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            return self._send_json(400, {"error": "Content-Length must be an integer"})
+        if length <= 0:
+            return self._send_json(400, {"error": "Request body must be the workbook"})
+        try:
+            priority = int(query.get("priority", 0))
+        except ValueError:
+            return self._send_json(400, {"error": "priority must be an integer"})
+        options = {key: query.get(key) == "1" for key in ("packed", "incremental")}
+        if query.get("key"):
+            options["key"] = query["key"]
+        job = self.server.service.submit(query.get("name", "workbook.xlsx"), self.rfile.read(length), priority,
+                                         options)
+        self._send_json(202, {"id": job.id})
+
+    def do_GET(self):
+        parts, _ = self._route()
+        if parts == ["health"]:
+            return self._send_json(200, {"status": "ok"})
+        if parts == ["jobs"]:
+            jobs = sorted(self.server.service.jobs.values(), key=lambda job: job.submitted)
+            return self._send_json(200, [job.to_dict() for job in jobs])
+        if len(parts) == 2 and parts[0] == "jobs":
+            job = self._job(parts[1])
+            if job is not None:
+                self._send_json(200, job.to_dict())
+            return
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+            job = self._job(parts[1])
+            if job is None:
+                return
+            if job.status != "done":
+                return self._send_json(409, {"error": f"Job {job.id} is {job.status}"})
+            with open(job.output_file, "rb") as f:
+                data = f.read()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(job.output_file)}"')
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != "jobs":
+            return self._send_json(404, {"error": f"Unknown path {self.path}"})
+        job = self._job(parts[1])
+        if job is None:
+            return
+        if not self.server.service.cancel(job.id):
+            return self._send_json(409, {"error": f"Job {job.id} is {job.status}"})
+        self._send_json(200, job.to_dict())
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), _ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+class RemoteProgress:
+    """Stands in for a ProgressTracker, showing the progress last reported by the service."""
+
+    def __init__(self):
+        self.started = None
+        self.latest = {"columns": {}, "done": 0, "total": 0, "elapsed_s": 0.0, "cells_per_s": 0.0, "requests": 0,
+                       "requests_per_s": 0.0, "in_flight": 0, "retries": 0, "eta_s": None}
+
+    def update(self, status):
+        if "progress" in status:
+            self.latest = status["progress"]
+            self.started = self.started or time.monotonic()
+
+    def snapshot(self, engine=None):
+        return self.latest
+
+class ServiceClient:
+    """Submits workbooks to a running service and waits for the results."""
+
+    def __init__(self, url=DEFAULT_SERVICE_URL, timeout=30.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, data=None):
+        request = urllib.request.Request(self.url + path, data=data, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            raise RuntimeError(f"Translation service: {message}") from None
+
+    def available(self):
+        try:
+            return json.loads(self._request("GET", "/health")).get("status") == "ok"
+        except (OSError, RuntimeError, ValueError):
+            return False
+
+    def submit(self, input_file, priority=0, packed=False, incremental=False, key=None):
+        # key names the incremental manifest to use; defaults to the file name
+        query = {
+            "name": os.path.basename(input_file), "priority": priority,
+            "packed": int(packed), "incremental": int(incremental),
+        }
+        if key:
+            query["key"] = key
+        query = urllib.parse.urlencode(query)
+        with open(input_file, "rb") as f:
+            return json.loads(self._request("POST", f"/jobs?{query}", f.read()))["id"]
+
+    def status(self, job_id):
+        return json.loads(self._request("GET", f"/jobs/{job_id}"))
+
+    def cancel(self, job_id):
+        return json.loads(self._request("DELETE", f"/jobs/{job_id}"))
+
+    def wait(self, job_id, interval=1.0, on_status=None):
+        # Polls until the job leaves the queue and finishes; returns its final status
+        while True:
+            status = self.status(job_id)
+            if on_status is not None:
+                on_status(status)
+            if status["status"] in ("done", "failed", "cancelled"):
+                return status
+            time.sleep(interval)
+
+    def download(self, job_id, output_file):
+        data = self._request("GET", f"/jobs/{job_id}/result")
+        with open(output_file, "wb") as f:
+            f.write(data)
+        return output_file
+
+    def translate(self, input_file, output_file, priority=0, packed=False, incremental=False, on_status=None):
+        # Submit, wait and download in one call; raises RuntimeError if the job fails.
+        # Incremental runs are keyed by the local output path, like a local run's manifest.
+        job_id = self.submit(input_file, priority, packed, incremental, key=os.path.abspath(output_file))
+        status = self.wait(job_id, on_status=on_status)
+        if status["status"] != "done":
+            raise RuntimeError(f"Job {job_id} {status['status']}: {status.get('error')}")
+        self.download(job_id, output_file)
+        return status
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local translation service with a priority job queue.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="jobs translated at the same time")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="where uploaded and translated files are kept")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="DeepSeek requests in flight across all jobs")
+    parser.add_argument("--deepl-concurrency", type=int, default=DEFAULT_DEEPL_CONCURRENCY,
+                        help="DeepL requests in flight across all jobs")
+    parser.add_argument("--rps", type=float, default=None, help="DeepSeek requests/sec across all jobs")
+    parser.add_argument("--tpm", type=int, default=None, help="DeepSeek tokens/min across all jobs")
+    parser.add_argument("--cache", default="translation_cache.sqlite3")
+    parser.add_argument("--backends", default=None,
+                        help=f"backend/column routing config (default: {DEFAULT_ROUTING_PATH} if it exists)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    from async_engine import AsyncTranslationEngine
+    from backends import load_routing
+    from clients import default_registry
+    from pipeline import column_routing
+    from prompts import DEEPSEEK_PROMPT_VERSION
+    from text_filters import TextFilter, DEFAULT_TEXT_FILTER
+    from translation_cache import TranslationCache
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(threadName)s - %(levelname)s - %(message)s")
+    args = parse_args(argv)
+
+    deepl_auth_key = os.getenv("DEEPL_AUTH_KEY")
+    deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
+    if not deepl_auth_key or not deepseek_api_key:
+        logger.error("DEEPL_AUTH_KEY and DEEPSEEK_API_KEY environment variables must be set.")
+        sys.exit(1)
+
+    backends, columns, text_filter = [], {}, DEFAULT_TEXT_FILTER
+    backends_config = args.backends or (DEFAULT_ROUTING_PATH if os.path.exists(DEFAULT_ROUTING_PATH) else None)
+    if backends_config:
+        try:
+            backends, columns = load_routing(backends_config, default_registry())
+            text_filter = TextFilter.from_config(backends_config)
+        except Exception as e:
+            logger.error(f"Failed to load backend config {backends_config}: {e}")
+            sys.exit(1)
+
+    cache = TranslationCache(args.cache)
+    cache.invalidate("deepseek", keep_prompt_version=DEEPSEEK_PROMPT_VERSION)
+    engine = AsyncTranslationEngine(
+        deepseek_api_key=deepseek_api_key,
+        deepl_translator=default_registry().deepl(deepl_auth_key, args.deepl_concurrency),
+        concurrency=args.concurrency, deepl_concurrency=args.deepl_concurrency,
+        requests_per_second=args.rps, tokens_per_minute=args.tpm, backends=backends, text_filter=text_filter
+    )
+    service = TranslationService(engine, cache, args.workdir, args.workers, column_routing(columns))
+    server = make_server(service, args.host, args.port)
+    logger.info(f"Translation service listening on http://{args.host}:{args.port} with {args.workers} workers.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,91 @@
-from gspread_helper import setup_gspread_client, append_row_to_sheet
+import re
+from gspread_helper import (setup_gspread_client, append_rows_to_sheet, WritePacer, DEFAULT_WRITE_INTERVAL,
+                            DEFAULT_APPEND_CHUNK_ROWS)
 
-def write_to_google_sheets(df, spreadsheet_id, credentials_path, logger):
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+_FLOAT_INT_RE = re.compile(r"^(\d+)\.0+$")
+
+def normalize_address(value):
+    # Numeric address columns with blanks are read as floats ("12.0")
+    address = str(value).strip().lower()
+    match = _FLOAT_INT_RE.match(address)
+    return match.group(1) if match else address
+
+class WorksheetIndex:
+    """Maps address numbers to worksheet titles.
+
+    Titles are split into alphanumeric tokens once, so an address that is a
+    whole token of exactly one title (address "1" in "Store 1") is found with a
+    dict lookup. Addresses that are not a token fall back to a substring scan,
+    done once per distinct address and memoized. Several candidates from
+    either step count as ambiguous and are not matched.
+    """
+
+    def __init__(self, titles):
+        self.titles = list(titles)
+        self._by_token = {}
+        for title in self.titles:
+            for token in set(_TOKEN_RE.findall(title.lower())):
+                self._by_token.setdefault(token, []).append(title)
+                if token.isdigit():
+                    # "Store 007" should also match address "7"
+                    stripped = token.lstrip("0") or "0"
+                    if stripped != token:
+                        self._by_token.setdefault(stripped, []).append(title)
+        self._resolved = {}
+
+    def match(self, address):
+        # Returns (title, candidates): title is None when nothing or more than one worksheet matched
+        address = normalize_address(address)
+        if address not in self._resolved:
+            candidates = self._by_token.get(address) or [t for t in self.titles if address and address in t.lower()]
+            candidates = list(dict.fromkeys(candidates))
+            title = candidates[0] if len(candidates) == 1 else None
+            self._resolved[address] = (title, candidates)
+        return self._resolved[address]
+
+def write_to_google_sheets(df, spreadsheet_id, credentials_path, logger, gc=None, write_interval=DEFAULT_WRITE_INTERVAL,
+                           chunk_rows=DEFAULT_APPEND_CHUNK_ROWS):
     unmatched_rows = []
 
     try:
-        gc = setup_gspread_client(credentials_path)
+        # The spreadsheet and its worksheets are opened once and reused for every row
+        gc = gc or setup_gspread_client(credentials_path)
         sh = gc.open_by_key(spreadsheet_id)
-        worksheet_titles = [ws.title for ws in sh.worksheets()]
+        worksheets = {ws.title: ws for ws in sh.worksheets()}
+        index = WorksheetIndex(worksheets)
 
+        rows_by_title = {}
+        reported = set()
         for _, row in df.iterrows():
             address_number = str(row['Address']).strip()
 
             # Find matching worksheet
-            matched_title = next((title for title in worksheet_titles if address_number in title), None)
+            matched_title, candidates = index.match(address_number)
 
             if not matched_title:
-                logger.warning(f"No worksheet found for address number: {address_number}")
+                if address_number not in reported:
+                    reported.add(address_number)
+                    if candidates:
+                        logger.warning(f"Address number {address_number} is ambiguous, matches worksheets: {candidates}")
+                    else:
+                        logger.warning(f"No worksheet found for address number: {address_number}")
                 unmatched_rows.append(row)
                 continue
 
-            try:
-                append_row_to_sheet(gc, spreadsheet_id, matched_title, row)
-            except Exception as e:
-                logger.error(f"Failed to write to '{matched_title}' for address '{address_number}': {e}")
-                unmatched_rows.append(row)
+            rows_by_title.setdefault(matched_title, []).append(row)
+
+        # One batched append per worksheet instead of one request per row, all
+        # worksheets sharing one pacer since the write quota is per user
+        pacer = WritePacer(write_interval)
+        for title, rows in rows_by_title.items():
+            failed_rows = append_rows_to_sheet(worksheets[title], rows, chunk_rows=chunk_rows, pacer=pacer)
+            if failed_rows:
+                logger.error(f"Failed to write {len(failed_rows)} row(s) to '{title}'.")
+                unmatched_rows.extend(failed_rows)
 
         logger.info(f"✅ Finished writing to Google Sheets.")
-        logger.info(f"❗ {len(unmatched_rows)} row(s) could not be matched to a worksheet.")
+        logger.info(f"❗ {len(unmatched_rows)} row(s) could not be matched to a worksheet or written.")
 
         return unmatched_rows
 
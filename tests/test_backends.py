@@ -0,0 +1,56 @@
+import json
+import pytest
+from async_engine import AsyncTranslationEngine, run_sync
+from backends import GlossaryBackend, check_routing, split_segments, join_segments
+
+def write_routing(tmp_path, config):
+    path = tmp_path / "routing.json"
+    path.write_text(json.dumps(config), encoding="utf-8")
+    return str(path)
+
+def test_check_routing_rejects_unknown_names_and_fallback_cycles(tmp_path):
+    chained = {
+        "backends": {
+            "local": {"type": "glossary", "path": "a.csv", "fallback": "shared"},
+            "shared": {"type": "glossary", "path": "b.csv", "fallback": "deepl"},
+        },
+        "columns": {"Pets_Kids": "local"},
+    }
+    assert check_routing(write_routing(tmp_path, chained)) == chained
+
+    with pytest.raises(ValueError, match="unknown backend 'deeepl'"):
+        check_routing(write_routing(tmp_path, {"backends": {"local": {"type": "glossary", "fallback": "deeepl"}}}))
+    with pytest.raises(ValueError, match="routed to unknown backend 'qwen'"):
+        check_routing(write_routing(tmp_path, {"columns": {"Scene": "qwen"}}))
+    looped = {"backends": {
+        "a": {"type": "glossary", "fallback": "b"},
+        "b": {"type": "glossary", "fallback": "a"},
+    }}
+    with pytest.raises(ValueError, match="loops: a -> b -> a"):
+        check_routing(write_routing(tmp_path, looped))
+
+def test_fallback_chain_stops_at_cycles_and_missing_backends():
+    engine = AsyncTranslationEngine(backends=[
+        GlossaryBackend({"狗": "Dog"}, name="a", fallback="b"),
+        GlossaryBackend({"猫": "Cat"}, name="b", fallback="a"),
+        GlossaryBackend({"狗": "Dog"}, name="c", fallback="missing"),
+    ])
+    seen = {}
+
+    results = run_sync(engine.translate("a", ["狗", "猫", "鱼"], on_result=seen.__setitem__))
+
+    assert results == ["Dog", "Cat", None]
+    assert seen == {0: "Dog", 1: "Cat"}
+    assert run_sync(engine.translate("c", ["狗", "猫"])) == ["Dog", None]
+
+def test_split_segments_keeps_line_breaks_and_budget():
+    assert split_segments("短句。", max_tokens=50) == (["短句。"], [])
+
+    text = "第一句话很长很长。\n第二句话也很长很长！第三句话还是很长很长？" + "无标点" * 10
+    segments, separators = split_segments(text, max_tokens=12)
+
+    assert segments[:3] == ["第一句话很长很长。", "第二句话也很长很长！", "第三句话还是很长很长？"]
+    assert all(len(segment) <= 12 for segment in segments)
+    # Line breaks survive; other boundaries become a space between translations
+    assert separators == ["\n"] + [" "] * (len(segments) - 2)
+    assert join_segments(segments, separators).replace(" ", "") == text
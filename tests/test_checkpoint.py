@@ -0,0 +1,35 @@
+import pandas as pd
+from checkpoint import CheckpointJournal
+
+def test_restore_skips_cells_whose_source_changed(tmp_path):
+    path = str(tmp_path / "out.xlsx.journal.jsonl")
+    journal = CheckpointJournal(path)
+    journal.record("Scene", [0, 2], "厨房", "Kitchen")
+    journal.record("Scene", [1], "客厅", "Living room")
+    journal.close()
+    # A crash mid-write leaves a partial last line
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"column": "Scene", "rows": ["3"')
+
+    df = pd.DataFrame({"Scene": ["厨房", "卧室", "厨房", "花园"]})
+    resumed = CheckpointJournal(path, resume=True)
+    mask = resumed.restore(df, "Scene", df["Scene"] != "")
+    resumed.close()
+
+    assert df["Scene"].tolist() == ["Kitchen", "卧室", "Kitchen", "花园"]
+    assert mask.tolist() == [False, True, False, True]
+    assert resumed.restore(df, "Pets_Kids", mask) is mask
+
+def test_fresh_run_discards_old_journal(tmp_path):
+    path = str(tmp_path / "out.xlsx.journal.jsonl")
+    journal = CheckpointJournal(path)
+    journal.record("Scene", [0], "厨房", "Kitchen")
+    journal.close()
+
+    df = pd.DataFrame({"Scene": ["厨房"]})
+    fresh = CheckpointJournal(path)
+    mask = fresh.restore(df, "Scene", df["Scene"] != "")
+    fresh.discard()
+
+    assert mask.tolist() == [True] and df.at[0, "Scene"] == "厨房"
+    assert not (tmp_path / "out.xlsx.journal.jsonl").exists()
@@ -0,0 +1,39 @@
+import pandas as pd
+from incremental import IncrementalManifest
+
+def make_rows(products):
+    return pd.DataFrame({"ASIN": ["B1", "B2", "B2"][:len(products)], "Date": "01/01/2025", "Product": products})
+
+def run(path, df, translate, scope="deepl"):
+    # One incremental pass: restore, "translate" what is left, commit and save
+    manifest = IncrementalManifest(path)
+    fingerprints = manifest.fingerprints(df)
+    mask = fingerprints.restore(df, "Product", df["Product"] != "", scope)
+    sent = df.loc[mask, "Product"].tolist()
+    done = [row for row in df.index[mask] if df.at[row, "Product"] in translate]
+    for row in done:
+        df.at[row, "Product"] = translate[df.at[row, "Product"]]
+    fingerprints.mark_done("Product", done)
+    fingerprints.commit(df)
+    manifest.save()
+    return sent
+
+def test_unchanged_cells_are_restored_and_failures_retried(tmp_path):
+    path = str(tmp_path / "out.xlsx.manifest.json")
+    glossary = {"狗": "Dog", "索尼": "索尼"}
+
+    assert run(path, make_rows(["狗", "索尼", "猫"]), glossary) == ["狗", "索尼", "猫"]
+
+    # The identity translation is kept; the failed cell is sent again
+    df = make_rows(["狗", "索尼", "猫"])
+    assert run(path, df, glossary) == ["猫"]
+    assert df["Product"].tolist() == ["Dog", "索尼", "猫"]
+
+def test_edited_cells_and_other_scopes_translate_again(tmp_path):
+    path = str(tmp_path / "out.xlsx.manifest.json")
+    run(path, make_rows(["狗", "索尼"]), {"狗": "Dog", "索尼": "Sony"})
+
+    assert run(path, make_rows(["狗", "新索尼"]), {}) == ["新索尼"]
+    assert run(path, make_rows(["狗", "索尼"]), {}, scope="deepseek") == ["狗", "索尼"]
+    # A manifest only keeps what its own run translated or reused
+    assert IncrementalManifest(path).previous == {"Product": {}}
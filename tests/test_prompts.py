@@ -0,0 +1,20 @@
+import json
+import pytest
+from prompts import parse_packed_response
+
+def test_parse_packed_response_orders_by_id_and_strips_fences():
+    reply = json.dumps({"translations": [{"id": 1, "text": " Cat "}, {"id": 0, "text": "Dog"}]})
+
+    assert parse_packed_response(reply, 2) == ["Dog", "Cat"]
+    assert parse_packed_response(f"```json\n{reply}\n```", 2) == ["Dog", "Cat"]
+
+@pytest.mark.parametrize("reply", [
+    "Sorry, I cannot help with that.",
+    json.dumps({"segments": []}),
+    json.dumps({"translations": [{"id": 0, "text": "Dog"}]}),
+    json.dumps({"translations": [{"id": 0, "text": "Dog"}, {"id": 0, "text": "Cat"}]}),
+    json.dumps({"translations": [{"id": 0, "text": "Dog"}, {"id": 2, "text": "Cat"}]}),
+])
+def test_parse_packed_response_rejects_incomplete_replies(reply):
+    with pytest.raises(ValueError):
+        parse_packed_response(reply, 2)
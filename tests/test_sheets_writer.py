@@ -0,0 +1,57 @@
+import logging
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.stubs import FakeGspreadClient
+from sheets_writer import write_to_google_sheets
+
+logger = logging.getLogger(__name__)
+
+def make_rows(addresses):
+    return pd.DataFrame({
+        "Date": "01/01/2025",
+        "Product": [f"product {i}" for i in range(len(addresses))],
+        "ASIN": [f"B{i:09d}" for i in range(len(addresses))],
+        "Model_Requirements": "N/A",
+        "Total_Video": np.int64(2),
+        "Scene": "kitchen",
+        "Pets_Kids": "N/A",
+        "Shooting_Requirements": np.nan,
+        "Address": addresses,
+    })
+
+def record_writes(gc):
+    # Timestamps of every append_rows call, across all worksheets
+    writes = []
+    for ws in gc.spreadsheet.worksheets():
+        def append_rows(values, value_input_option=None, _append=ws.append_rows, _title=ws.title, **kwargs):
+            writes.append((_title, len(values), time.monotonic()))
+            _append(values, value_input_option, **kwargs)
+        ws.append_rows = append_rows
+    return writes
+
+def test_rows_are_grouped_by_worksheet_and_chunked():
+    gc = FakeGspreadClient(["Store 1", "Store 2", "Archive"], latency=0)
+    writes = record_writes(gc)
+    df = make_rows(["1"] * 5 + ["2"] * 2 + ["1.0", "99"])
+
+    unmatched = write_to_google_sheets(df, "sheet", None, logger, gc=gc, write_interval=0, chunk_rows=2)
+
+    assert [(title, count) for title, count, _ in writes] == [
+        ("Store 1", 2), ("Store 1", 2), ("Store 1", 2), ("Store 2", 2),
+    ]
+    store_1 = gc.spreadsheet.worksheet("Store 1")
+    assert len(store_1.rows) == 6
+    assert store_1.rows[0][4] == 2 and store_1.rows[0][7] == ""
+    assert [str(row["Address"]) for row in unmatched] == ["99"]
+
+def test_writes_are_paced_across_worksheets():
+    gc = FakeGspreadClient(["Store 1", "Store 2", "Store 3"], latency=0)
+    writes = record_writes(gc)
+    df = make_rows(["1", "1", "2", "3"])
+
+    write_to_google_sheets(df, "sheet", None, logger, gc=gc, write_interval=0.05, chunk_rows=1)
+
+    assert [title for title, _, _ in writes] == ["Store 1", "Store 1", "Store 2", "Store 3"]
+    gaps = [b[2] - a[2] for a, b in zip(writes, writes[1:])]
+    assert min(gaps) >= 0.045
@@ -0,0 +1,18 @@
+import pandas as pd
+from text_filters import TextFilter
+
+def test_classify_labels_cells_that_need_no_translation():
+    cells = pd.Series(["宠物友好", "用iPhone 15拍摄", None, "  ", "N/A", "tbd", "https://example.com/a",
+                       "B0C1234567", "12/05/2025", "$19.99", "Kitchen only", "Kitchen 厨"])
+
+    reasons = TextFilter().classify(cells)
+
+    assert reasons.tolist() == ["", "", "empty", "empty", "passthrough", "passthrough", "url",
+                                "code", "code", "code", "not_chinese", ""]
+
+def test_classify_honours_ratio_and_extra_passthrough():
+    cells = pd.Series(["Kitchen 厨", "无"], index=[10, 20])
+
+    reasons = TextFilter(min_cjk_ratio=0.5, passthrough=["无"]).classify(cells)
+
+    assert reasons.to_dict() == {10: "not_chinese", 20: "passthrough"}
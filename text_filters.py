@@ -0,0 +1,60 @@
+import json
+import pandas as pd
+
+# Han ideographs (CJK Unified, Extension A and Compatibility)
+CJK_PATTERN = "[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]"
+
+# Share of non-space characters that must be Han for a cell to count as Chinese;
+# low enough for mixed text like "用iPhone 15拍摄" to still be translated
+DEFAULT_MIN_CJK_RATIO = 0.1
+
+# Cell values left exactly as they are (compared case-insensitively after
+# stripping); includes the N/A filler that preprocessing puts in empty cells
+DEFAULT_PASSTHROUGH = ("n/a", "na", "nan", "none", "null", "-", "--", "/", "tbd")
+
+_URL_RE = r"^\s*(?:https?://|www\.)\S+\s*$"
+# Numbers, dates, prices and product codes such as ASINs or SKUs. Classes are
+# spelled out because pandas may run these through RE2, where \W is ASCII-only
+_CODE_RE = r"^\s*(?:[\d\s.,:;/\\+\-*%$#()\[\]_~]+|[A-Z0-9][A-Z0-9\-_./]*\d[A-Z0-9\-_./]*)\s*$"
+
+class TextFilter:
+    """Vectorized pre-classifier deciding which cells of a column need translating.
+
+    classify() labels every cell with the reason it is skipped ("empty",
+    "passthrough", "url", "code", "not_chinese") or "" when it contains
+    enough Chinese to be worth sending to a translation backend.
+    """
+
+    def __init__(self, min_cjk_ratio=DEFAULT_MIN_CJK_RATIO, passthrough=DEFAULT_PASSTHROUGH):
+        self.min_cjk_ratio = min_cjk_ratio
+        self.passthrough = {value.strip().lower() for value in passthrough}
+
+    @classmethod
+    def from_config(cls, path):
+        # Optional "passthrough" (extra values) and "min_cjk_ratio" keys of the routing config
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(
+            min_cjk_ratio=config.get("min_cjk_ratio", DEFAULT_MIN_CJK_RATIO),
+            passthrough=list(DEFAULT_PASSTHROUGH) + list(config.get("passthrough", [])),
+        )
+
+    def classify(self, series):
+        text = series.fillna("").astype(str)
+        stripped = text.str.strip()
+        cjk = text.str.count(CJK_PATTERN)
+        visible = text.str.count(r"\S")
+        ratio = cjk / visible.where(visible > 0, 1)
+
+        reasons = pd.Series("", index=series.index, dtype=object)
+        reasons[cjk.eq(0) | ratio.lt(self.min_cjk_ratio)] = "not_chinese"
+        reasons[stripped.str.match(_CODE_RE)] = "code"
+        reasons[stripped.str.match(_URL_RE)] = "url"
+        reasons[stripped.str.lower().isin(self.passthrough)] = "passthrough"
+        reasons[stripped.eq("")] = "empty"
+        return reasons
+
+    def needs_translation(self, series):
+        return self.classify(series).eq("")
+
+DEFAULT_TEXT_FILTER = TextFilter()
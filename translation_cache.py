@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = "translation_cache.sqlite3"
+DEFAULT_MAX_ENTRIES = 200000
+DEFAULT_MEMORY_ENTRIES = 20000
+
+# SQLite's default limit on bound parameters is 999.
+_QUERY_CHUNK = 500
+
+class TranslationCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, memory_entries=DEFAULT_MEMORY_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Several batch worker processes may share one cache file; wait out their write locks
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY,"
+            " engine TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " prompt_version TEXT NOT NULL,"
+            " target_lang TEXT NOT NULL,"
+            " translation TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_engine ON translations (engine, prompt_version)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(engine, model, prompt_version, target_lang, text):
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{engine}|{model}|{prompt_version}|{target_lang}|{digest}"
+
+    def get_many(self, engine, model, prompt_version, target_lang, texts):
+        """Return {text: translation} for every text already in the cache."""
+        found = {}
+        pending = {}
+        with self._lock:
+            for text in texts:
+                if text in found or text in pending:
+                    continue
+                key = self.make_key(engine, model, prompt_version, target_lang, text)
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[text] = self._memory[key]
+                else:
+                    pending[key] = text
+
+            keys = list(pending)
+            now = time.time()
+            for i in range(0, len(keys), _QUERY_CHUNK):
+                chunk = keys[i:i + _QUERY_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, translation FROM translations WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, translation in rows:
+                    found[pending[key]] = translation
+                    self._remember(key, translation)
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE translations SET last_used = ? WHERE key = ?",
+                        [(now, key) for key, _ in rows]
+                    )
+            self._conn.commit()
+
+            hits = len(found)
+            self.hits += hits
+            self.misses += len(set(texts)) - hits
+        return found
+
+    def set_many(self, engine, model, prompt_version, target_lang, translations):
+        """Store {text: translation} pairs and evict the least recently used overflow."""
+        if not translations:
+            return
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, translation in translations.items():
+                key = self.make_key(engine, model, prompt_version, target_lang, text)
+                self._remember(key, translation)
+                rows.append((key, engine, model, prompt_version, target_lang, translation, now))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations"
+                " (key, engine, model, prompt_version, target_lang, translation, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def invalidate(self, engine=None, keep_prompt_version=None):
+        """Drop cached entries, e.g. after the system prompt changed.
+
+        With keep_prompt_version set, only entries produced by other prompt
+        versions are removed.
+        """
+        clauses, params = [], []
+        if engine is not None:
+            clauses.append("engine = ?")
+            params.append(engine)
+        if keep_prompt_version is not None:
+            clauses.append("prompt_version != ?")
+            params.append(keep_prompt_version)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            removed = self._conn.execute(f"DELETE FROM translations{where}", params).rowcount
+            self._conn.commit()
+            self._memory.clear()
+
+        if removed:
+            logging.getLogger().info(f"Translation cache: invalidated {removed} entries.")
+        return removed
+
+    def stats(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": hit_rate}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _remember(self, key, translation):
+        self._memory[key] = translation
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM translations WHERE key IN"
+                " (SELECT key FROM translations ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
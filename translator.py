@@ -1,96 +1,191 @@
-import time
-import random
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from openai import OpenAI
+import asyncio
+import re
+import unicodedata
+from async_engine import AsyncTranslationEngine, run_sync, DEFAULT_PACK_TOKEN_BUDGET, DEEPSEEK_BASE_URL
 
 EXPECTED_COLUMNS = [
     'Date', 'Address', 'Product', 'ASIN', 'Model_Requirements',
     'Total_Video', 'Scene', 'Pets_Kids', 'Requirements', 'Comments'
 ]
 
-def retry_with_backoff(func, retries=3, base_delay=1.0, max_delay=5.0):
-    for attempt in range(retries):
-        try:
-            return func()
-        except Exception as e:
-            if attempt == retries - 1:
-                raise e
-            delay = min(base_delay * (2 ** attempt), max_delay) + random.uniform(0, 1)
-            time.sleep(delay)
-
-def translate_column_deepl(df, col, translator):
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCT_RE = re.compile(r"[\s.,;:!?。，、；：！？]+$")
+
+def normalize_text(text):
+    # NFKC folds full-width forms (，！ etc.) into their ASCII equivalents
+    text = unicodedata.normalize("NFKC", text)
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    return _TRAILING_PUNCT_RE.sub("", text)
+
+def dedupe_texts(texts, normalize=False):
+    # Returns the unique texts (first occurrence wins) and, for every input
+    # text, the position of its representative in that unique list.
+    positions = {}
+    unique_texts = []
+    index = []
+    for text in texts:
+        key = normalize_text(text) if normalize else text
+        if key not in positions:
+            positions[key] = len(unique_texts)
+            unique_texts.append(text)
+        index.append(positions[key])
+    return unique_texts, index
+
+def _log_dedup(col, total, unique, logger):
+    saved = 1 - unique / total if total else 0.0
+    logger.info(f"Column '{col}': {total} entries collapsed to {unique} unique texts ({saved:.0%} duplicates).")
+
+async def _translate_with_cache(texts, translate_many, cache, cache_scope, col, logger, on_result=None, metrics=None):
+    # translate_many returns one result per input text, with None for failures;
+    # failures are never written to the cache. on_result(i, translation) fires
+    # as soon as texts[i] is resolved, from the cache or the engine.
+    if cache is None:
+        return await translate_many(texts, on_result)
+
+    cached = await asyncio.to_thread(cache.get_many, *cache_scope, texts)
+    miss_positions = [i for i, text in enumerate(texts) if text not in cached]
+    misses = [texts[i] for i in miss_positions]
+    logger.info(f"Cache for column '{col}': {len(cached)} hits, {len(misses)} misses.")
+    if metrics is not None:
+        metrics.record_cache(len(cached), len(misses))
+
+    if on_result is not None:
+        for i, text in enumerate(texts):
+            if text in cached:
+                on_result(i, cached[text])
+
+    def on_miss_result(j, result):
+        on_result(miss_positions[j], result)
+
+    fresh = {}
+    if misses:
+        results = await translate_many(misses, on_miss_result if on_result is not None else None)
+        fresh = dict(zip(misses, results))
+    await asyncio.to_thread(
+        cache.set_many, *cache_scope, {text: result for text, result in fresh.items() if result is not None}
+    )
+
+    stats = cache.stats()
+    logger.info(f"Cache totals: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate).")
+    return [cached[text] if text in cached else fresh[text] for text in texts]
+
+async def translate_column_async(df, col, engine_name, engine, cache=None, normalize_duplicates=False,
+                                 journal=None, previous=None, **options):
     import logging
     logger = logging.getLogger()
-
     if col not in df.columns:
         logger.warning(f"Column '{col}' not found, skipping.")
         return df
 
-    df[col] = df[col].astype(str).fillna('')
-    mask = df[col] != ""
+    try:
+        backend = engine.backend(engine_name)
+    except RuntimeError as e:
+        logger.error(f"Cannot translate column '{col}': {e}")
+        return df
+    label = backend.label
+
+    # fillna must come first, or NaN becomes the string "nan" and is sent for translation
+    df[col] = df[col].fillna('').astype(str)
+    if engine.text_filter is not None:
+        reasons = engine.text_filter.classify(df[col])
+        mask = reasons.eq("")
+        skipped = reasons[~mask & reasons.ne("empty")].value_counts()
+        if len(skipped):
+            breakdown = ", ".join(f"{count} {reason.replace('_', ' ')}" for reason, count in skipped.items())
+            logger.info(f"Column '{col}': {int(skipped.sum())} cells need no translation ({breakdown}).")
+            engine.metrics.record_skipped(int(skipped.sum()))
+    else:
+        mask = df[col] != ""
+    if previous is not None:
+        # Unchanged cells keep the translation from the last run of this workbook
+        scope = backend.cache_scope() or (backend.name,)
+        mask = previous.restore(df, col, mask, "|".join(map(str, scope)))
+    if journal is not None:
+        before = mask
+        mask = journal.restore(df, col, mask)
+        if previous is not None:
+            previous.mark_done(col, df.index[before & ~mask])
     texts_to_translate = df.loc[mask, col].tolist()
+    # Registered even when nothing is left to send, so a fully skipped or
+    # restored column still counts towards the run's totals
+    progress = engine.progress
+    progress.add_cells(col, int(mask.size), done=int(mask.size - mask.sum()))
 
     if not texts_to_translate:
-        logger.info(f"No non-empty values to translate in column '{col}'.")
+        logger.info(f"No values to translate in column '{col}'.")
         return df
 
-    logger.info(f"Translating {len(texts_to_translate)} entries in column '{col}' using DeepL...")
+    logger.info(f"Translating {len(texts_to_translate)} entries in column '{col}' using {label}...")
 
-    try:
-        translations = translator.translate_text(texts_to_translate, target_lang="EN-US")
-        df.loc[mask, col] = [t.text for t in translations]
-    except Exception as e:
-        logger.error(f"DeepL translation failed for column '{col}': {e}")
+    async def translate_many(texts, on_result):
+        return await engine.translate(engine_name, texts, on_result=on_result, **options)
 
-    return df
+    unique_texts, index = dedupe_texts(texts_to_translate, normalize=normalize_duplicates)
+    _log_dedup(col, len(texts_to_translate), len(unique_texts), logger)
 
-def translate_column_deepseek(df, col, api_key, max_workers):
-    import logging
-    logger = logging.getLogger()
-
-    if col not in df.columns:
-        logger.warning(f"Column '{col}' not found, skipping.")
-        return df
+    cells_per_unique = [0] * len(unique_texts)
+    for i in index:
+        cells_per_unique[i] += 1
+    reported = 0
 
-    df[col] = df[col].astype(str).fillna('')
-    mask = df[col] != ""
-    texts_to_translate = df.loc[mask, col].tolist()
+    rows_by_unique = None
+    if journal is not None:
+        # Rows are grouped by their exact source text, which may differ from the
+        # representative when normalize_duplicates merged near-identical texts
+        rows_by_unique = [{} for _ in unique_texts]
+        for row, text, i in zip(df.index[mask], texts_to_translate, index):
+            rows_by_unique[i].setdefault(text, []).append(row)
 
-    if not texts_to_translate:
-        logger.info(f"No non-empty values to translate in column '{col}'.")
-        return df
+    def on_result(i, result):
+        nonlocal reported
+        reported += cells_per_unique[i]
+        progress.advance(col, cells_per_unique[i])
+        if rows_by_unique is not None:
+            # Checkpoint each translation as it lands so a crash keeps finished work
+            for source_text, rows in rows_by_unique[i].items():
+                journal.record(col, rows, source_text, result)
 
-    logger.info(f"Translating {len(texts_to_translate)} entries in column '{col}' using DeepSeek with {max_workers} threads...")
-
-    client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
-
-    def translate_text(text):
-        def call_api():
-            response = client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": (
-                        "You are a professional, accurate, and natural translator. "
-                        "Do not add any introductions, commentary, or explanations. Only output the translated English text."
-                    )},
-                    {"role": "user", "content": f"Translate this Chinese text to fluent English:\n\n{text}"}
-                ],
-                stream=False
+    try:
+        with engine.metrics.stage(f"column:{col}"):
+            translated = await _translate_with_cache(
+                unique_texts, translate_many, cache if backend.cacheable else None, backend.cache_scope(),
+                col, logger, on_result, engine.metrics
             )
-            return response.choices[0].message.content.strip()
-
-        try:
-            return retry_with_backoff(call_api)
-        except Exception as e:
-            logger.error(f"DeepSeek translation failed for text: {e}")
-            return text  # fallback
-
-    translated = [None] * len(texts_to_translate)
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(translate_text, text): idx for idx, text in enumerate(texts_to_translate)}
-        for future in as_completed(futures):
-            idx = futures[future]
-            translated[idx] = future.result()
-
-    df.loc[mask, col] = translated
+    except Exception as e:
+        logger.error(f"{label} translation failed for column '{col}': {e}")
+        return df
+    finally:
+        # Failed cells never report a result; count them as done with the column
+        progress.advance(col, len(texts_to_translate) - reported)
+
+    # Fall back to the original text for anything that failed
+    df.loc[mask, col] = [
+        translated[i] if translated[i] is not None else text
+        for i, text in zip(index, texts_to_translate)
+    ]
+    if previous is not None:
+        previous.mark_done(col, [row for row, i in zip(df.index[mask], index) if translated[i] is not None])
     return df
+
+def translate_column_deepl(df, col, translator, cache=None, normalize_duplicates=False, engine=None):
+    engine = engine or AsyncTranslationEngine(deepl_translator=translator)
+    return run_sync(translate_column_async(df, col, "deepl", engine, cache, normalize_duplicates))
+
+def translate_column_deepseek(df, col, api_key, max_workers, cache=None, normalize_duplicates=False,
+                              packed=False, pack_token_budget=DEFAULT_PACK_TOKEN_BUDGET, engine=None,
+                              base_url=DEEPSEEK_BASE_URL, stream=False):
+    # max_workers is the number of requests kept in flight on the shared event loop;
+    # base_url can point at any OpenAI-compatible endpoint serving the same model name
+    owns_engine = engine is None
+    if owns_engine:
+        engine = AsyncTranslationEngine(deepseek_api_key=api_key, concurrency=max_workers, base_url=base_url,
+                                        stream=stream)
+
+    try:
+        return run_sync(translate_column_async(
+            df, col, "deepseek", engine, cache, normalize_duplicates,
+            packed=packed, pack_token_budget=pack_token_budget
+        ))
+    finally:
+        if owns_engine:
+            engine.close()